@@ -15,13 +15,14 @@ from schemas.address import StoreAddressRead, AddressRead
 from schemas.cart import (OrderRead, OrderUpdate, OrderStatus, OrderItemRead)
 # База данных
 from core.database import get_session
+from core.replicas import get_read_session
 
 
 def setup_admin_endpoints(app: FastAPI):
 
     @app.get("/admin/orders/active-count/", tags=["Admin"], response_model=int)
     async def get_active_orders_count(
-            session: Session = Depends(get_session)
+            session: Session = Depends(get_read_session)
     ):
         """Получение количества активных заказов (NEW, ASSEMBLING, ON_THE_WAY)"""
 
@@ -38,7 +39,7 @@ def setup_admin_endpoints(app: FastAPI):
 
     @app.get("/admin/orders/status-counts/", tags=["Admin"], response_model=Dict[OrderStatus, int])
     async def get_orders_count_by_status(
-            session: Session = Depends(get_session)
+            session: Session = Depends(get_read_session)
     ):
         """Получение количества заказов по каждому статусу"""
 
@@ -52,7 +53,7 @@ def setup_admin_endpoints(app: FastAPI):
 
     @app.get("/admin/orders/", response_model=Dict[str, Any], tags=["Admin"])
     async def get_all_orders(
-            session: Session = Depends(get_session),
+            session: Session = Depends(get_read_session),
             page: int = Query(1, alias="page", ge=1),
             limit: int = Query(9, alias="limit", ge=1, le=100),
             status: str = Query("all", alias="status")
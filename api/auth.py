@@ -167,13 +167,13 @@ def setup_auth_endpoints(app):
 
         # Создаем новую сессию
         refresh_token_cookie = create_refresh_token()
-        user_session = UserSession(
+        UserSession.create(
+            session,
             user_id=user.id,
             refresh_token=refresh_token_cookie,
             user_agent=request.headers.get("User-Agent"),
             ip_address=request.client.host
         )
-        session.add(user_session)
 
         # Обновляем время последнего входа
         user.last_login = datetime.now(UTC)
@@ -3,7 +3,9 @@ from uuid import uuid4
 
 # 2. Библиотеки сторонних пакетов
 from fastapi import FastAPI, HTTPException, Depends, Response, Request
-from sqlmodel import Session, select, delete
+from sqlalchemy.orm import selectinload
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
 # 3. Локальные модули
@@ -18,13 +20,17 @@ from models.models import DrinkVolumePrice
 # Схемы для сериализации данных
 from schemas.cart import (CartItemCreate, CartRead, CartItemRead)
 # База данных
-from core.database import get_session
+from core.database import get_async_session
 
+# Свойства позиции (название, изображение, состав) читают объем и напиток -
+# в AsyncSession они должны быть загружены заранее, ленивая загрузка недоступна
+CART_ITEM_OPTIONS = selectinload(CartItem.drink_volume_price).selectinload(DrinkVolumePrice.drink)
 
-def get_or_create_cart(
+
+async def get_or_create_cart(
         request: Request,
         response: Response,
-        session: Session = Depends(get_session),
+        session: AsyncSession = Depends(get_async_session),
         current_user: Optional[User] = None
 ) -> Cart:
     """Объединяет гостевую и пользовательскую корзины при входе"""
@@ -35,32 +41,33 @@ def get_or_create_cart(
 
     # 1. Находим гостевую корзину (если есть)
     if session_key:
-        guest_cart = session.exec(
+        guest_cart = (await session.exec(
             select(Cart)
             .where(Cart.session_key == session_key)
             .where(Cart.user_id.is_(None))
-        ).first()
+        )).first()
 
     # 2. Находим пользовательскую корзину (если пользователь авторизован)
     if current_user:
-        user_cart = session.exec(
+        user_cart = (await session.exec(
             select(Cart).where(Cart.user_id == current_user.id)
-        ).first()
+        )).first()
 
     # 3. Слияние корзин при входе пользователя
     if current_user and guest_cart and (not user_cart or user_cart.id != guest_cart.id):
         if user_cart:
-            # Переносим товары из гостевой корзины в пользовательскую
-            guest_items = session.exec(
-                select(CartItem).where(CartItem.cart_id == guest_cart.id)
-            ).all()
+            # Переносим товары из гостевой корзины в пользовательскую:
+            # позиции обеих корзин и их объемы загружаются сразу, без запроса на каждую позицию
+            items = (await session.exec(
+                select(CartItem)
+                .where(CartItem.cart_id.in_([guest_cart.id, user_cart.id]))
+                .options(selectinload(CartItem.drink_volume_price))
+            )).all()
+            user_items = {item.drink_volume_price_id: item for item in items if item.cart_id == user_cart.id}
+            guest_items = [item for item in items if item.cart_id == guest_cart.id]
 
             for item in guest_items:
-                existing_item = session.exec(
-                    select(CartItem)
-                    .where(CartItem.cart_id == user_cart.id)
-                    .where(CartItem.drink_volume_price_id == item.drink_volume_price_id)
-                ).first()
+                existing_item = user_items.get(item.drink_volume_price_id)
 
                 if existing_item:
                     existing_item.quantity += item.quantity
@@ -72,7 +79,7 @@ def get_or_create_cart(
                     item.cart_id = user_cart.id
                     session.add(item)
 
-            session.delete(guest_cart)
+            await session.delete(guest_cart)
             cart = user_cart
         else:
             # Привязываем гостевую корзину к пользователю
@@ -88,8 +95,8 @@ def get_or_create_cart(
             domain="graduate-work-backend.onrender.com"
         )
 
-        session.commit()
-        update_cart_totals(cart.id, session)
+        await session.commit()
+        await update_cart_totals(cart.id, session)
         return cart
 
     # 4. Возвращаем существующую корзину
@@ -100,15 +107,15 @@ def get_or_create_cart(
 
     # 5. Создаем новую корзину
     new_session_key = str(uuid4())
-    cart = Cart(
+    cart = await Cart.create_async(
+        session,
         session_key=new_session_key,
         user_id=current_user.id if current_user else None,
         cart_subtotal=0,
         cart_discount=0,
         cart_total=0
     )
-    session.add(cart)
-    session.commit()
+    await session.commit()
 
     if not current_user:
         response.set_cookie(
@@ -125,12 +132,12 @@ def get_or_create_cart(
 
 
 
-def update_cart_totals(cart_id: int, session: Session):
-    cart = session.get(Cart, cart_id)
+async def update_cart_totals(cart_id: int, session: AsyncSession):
+    cart = await session.get(Cart, cart_id)
     if not cart:
         return
 
-    cart_items = session.exec(select(CartItem).where(CartItem.cart_id == cart_id)).all()
+    cart_items = (await session.exec(select(CartItem).where(CartItem.cart_id == cart_id))).all()
 
     # Пересчитываем общие суммы корзины
     cart.cart_subtotal = sum(item.item_subtotal for item in cart_items)
@@ -138,8 +145,19 @@ def update_cart_totals(cart_id: int, session: Session):
     cart.cart_total = sum(item.item_total for item in cart_items)
 
     session.add(cart)
-    session.commit()
-    session.refresh(cart)
+    await session.commit()
+    await session.refresh(cart)
+
+
+async def read_cart_item(cart_item_id: int, session: AsyncSession) -> CartItemRead:
+    """Позиция корзины для ответа: объем и напиток загружаются вместе с ней"""
+    cart_item = (await session.exec(
+        select(CartItem)
+        .where(CartItem.id == cart_item_id)
+        .options(CART_ITEM_OPTIONS)
+        .execution_options(populate_existing=True)
+    )).one()
+    return CartItemRead.model_validate(cart_item)
 
 
 def setup_cart_endpoints(app: FastAPI):
@@ -152,17 +170,17 @@ def setup_cart_endpoints(app: FastAPI):
             request: Request,
             response: Response,
             current_user: Optional[User] = Depends(get_user_or_none),
-            session: Session = Depends(get_session)
+            session: AsyncSession = Depends(get_async_session)
     ):
         """
         Добавление товара в корзину пользователя.
         Возвращает созданную или обновленную позицию с расчетом всех ценовых показателей.
         """
         # Получение корзины (работает для всех пользователей)
-        cart = get_or_create_cart(request, response, session, current_user)
+        cart = await get_or_create_cart(request, response, session, current_user)
 
         # Проверка существования товара
-        drink_volume_price = session.get(DrinkVolumePrice, item_data.drink_volume_price_id)
+        drink_volume_price = await session.get(DrinkVolumePrice, item_data.drink_volume_price_id)
         if not drink_volume_price:
             raise HTTPException(status_code=404, detail="Товар не найден")
 
@@ -174,15 +192,14 @@ def setup_cart_endpoints(app: FastAPI):
             )
 
         # Поиск существующей позиции в корзине
-        existing_item = session.exec(
+        existing_item = (await session.exec(
             select(CartItem)
             .where(CartItem.cart_id == cart.id)
             .where(CartItem.drink_volume_price_id == item_data.drink_volume_price_id)
-        ).first()
+        )).first()
 
-        # Определяем процент скидки (из объема или глобальный)
-        sale_percent = drink_volume_price.sale or drink_volume_price.drink.global_sale or 0
-        price_final = round(drink_volume_price.price * (100 - sale_percent) / 100)
+        # Итоговая цена уже материализована в объеме (без обращения к напитку)
+        price_final = drink_volume_price.price_final
 
         # Обновление количества или создание новой позиции
         if existing_item:
@@ -193,7 +210,7 @@ def setup_cart_endpoints(app: FastAPI):
             existing_item.item_total = price_final * existing_item.quantity
             cart_item = existing_item
         else:
-            cart_item = CartItem.create(
+            cart_item = await CartItem.create_async(
                 session,
                 cart_id=cart.id,
                 drink_id=drink_volume_price.drink_id,
@@ -208,13 +225,11 @@ def setup_cart_endpoints(app: FastAPI):
         # Корректировка остатков на складе
         drink_volume_price.quantity -= item_data.quantity
         session.add(drink_volume_price)
-        session.commit()
-        session.refresh(cart_item)
-
-        update_cart_totals(cart.id, session)
+        await session.commit()
+        await update_cart_totals(cart.id, session)
 
         # Формирование ответа
-        return CartItemRead.model_validate(cart_item)
+        return await read_cart_item(cart_item.id, session)
 
     @app.delete("/cart/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
     async def remove_from_cart(
@@ -222,11 +237,11 @@ def setup_cart_endpoints(app: FastAPI):
             request: Request,
             response: Response,
             current_user: Optional[User] = Depends(get_user_or_none),
-            session: Session = Depends(get_session)
+            session: AsyncSession = Depends(get_async_session)
     ):
         """Удаление товара из корзины пользователя с возвратом количества на склад"""
         # Находим элемент корзины
-        cart_item = session.get(CartItem, item_id)
+        cart_item = await session.get(CartItem, item_id)
         if not cart_item:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -234,15 +249,15 @@ def setup_cart_endpoints(app: FastAPI):
             )
 
         # Проверяем, что товар принадлежит корзине текущего пользователя
-        cart = get_or_create_cart(request, response, session, current_user)
+        cart = await get_or_create_cart(request, response, session, current_user)
         if not cart or cart_item.cart_id != cart.id:
             raise HTTPException(status_code=403, detail="Нельзя изменить чужую корзину")
 
         # Находим связанный товар на складе
-        drink_volume_price = session.get(DrinkVolumePrice, cart_item.drink_volume_price_id)
+        drink_volume_price = await session.get(DrinkVolumePrice, cart_item.drink_volume_price_id)
         if not drink_volume_price:
-            session.delete(cart_item)
-            session.commit()
+            await session.delete(cart_item)
+            await session.commit()
             return Response(status_code=status.HTTP_204_NO_CONTENT)
 
         try:
@@ -251,12 +266,12 @@ def setup_cart_endpoints(app: FastAPI):
             session.add(drink_volume_price)
 
             # Удаляем элемент из корзины
-            session.delete(cart_item)
-            session.commit()
-            update_cart_totals(cart.id, session)
+            await session.delete(cart_item)
+            await session.commit()
+            await update_cart_totals(cart.id, session)
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при удалении товара из корзины: {str(e)}"
@@ -269,27 +284,26 @@ def setup_cart_endpoints(app: FastAPI):
             request: Request,
             response: Response,
             current_user: Optional[User] = Depends(get_user_or_none),
-            session: Session = Depends(get_session)
+            session: AsyncSession = Depends(get_async_session)
     ):
         """ Уменьшает количество товара на 1 единицу """
-        cart_item = session.get(CartItem, item_id)
+        cart_item = await session.get(CartItem, item_id)
         if not cart_item:
             raise HTTPException(status_code=404, detail="Позиция не найдена")
 
         # Проверка прав доступа
-        cart = get_or_create_cart(request, response, session, current_user)
+        cart = await get_or_create_cart(request, response, session, current_user)
         if not cart or cart_item.cart_id != cart.id:
             raise HTTPException(status_code=403, detail="Нельзя изменить чужую корзину")
 
         # Получаем связанный товар на складе
-        drink_volume_price = session.get(DrinkVolumePrice, cart_item.drink_volume_price_id)
+        drink_volume_price = await session.get(DrinkVolumePrice, cart_item.drink_volume_price_id)
 
         # Уменьшаем количество в корзине
         cart_item.quantity -= 1
 
         # Пересчитываем суммы при уменьшении количества
-        sale_percent = drink_volume_price.sale or drink_volume_price.drink.global_sale or 0
-        price_final = round(drink_volume_price.price * (100 - sale_percent) / 100)
+        price_final = drink_volume_price.price_final
 
         cart_item.item_subtotal = drink_volume_price.price * cart_item.quantity
         cart_item.item_discount = (drink_volume_price.price - price_final) * cart_item.quantity
@@ -301,11 +315,10 @@ def setup_cart_endpoints(app: FastAPI):
             session.add(drink_volume_price)
 
         session.add(cart_item)
-        session.commit()
-        update_cart_totals(cart.id, session)
-        session.refresh(cart_item)
+        await session.commit()
+        await update_cart_totals(cart.id, session)
 
-        return CartItemRead.model_validate(cart_item)
+        return await read_cart_item(cart_item.id, session)
 
 
     @app.delete("/cart/", status_code=status.HTTP_204_NO_CONTENT)
@@ -313,33 +326,37 @@ def setup_cart_endpoints(app: FastAPI):
             request: Request,
             response: Response,
             current_user: Optional[User] = Depends(get_user_or_none),
-            session: Session = Depends(get_session)
+            session: AsyncSession = Depends(get_async_session)
     ):
         """Полная очистка корзины пользователя с возвратом всех товаров на склад"""
 
         # Получаем корзину пользователя
-        cart = get_or_create_cart(request, response, session, current_user)
+        cart = await get_or_create_cart(request, response, session, current_user)
         if not cart:
             return Response(status_code=status.HTTP_204_NO_CONTENT)
 
         try:
             # Получаем все элементы корзины
-            cart_items = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
+            cart_items = (await session.exec(
+                select(CartItem)
+                .where(CartItem.cart_id == cart.id)
+                .options(selectinload(CartItem.drink_volume_price))
+            )).all()
 
-            # Возвращаем все товары на склад
+            # Возвращаем все товары на склад (объемы загружены вместе с позициями)
             for item in cart_items:
-                drink_volume_price = session.get(DrinkVolumePrice, item.drink_volume_price_id)
+                drink_volume_price = item.drink_volume_price
                 if drink_volume_price:
                     drink_volume_price.quantity += item.quantity
                     session.add(drink_volume_price)
 
             # Удаляем все элементы корзины
-            session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
-            session.commit()
-            update_cart_totals(cart.id, session)
+            await session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
+            await session.commit()
+            await update_cart_totals(cart.id, session)
 
         except Exception as e:
-            session.rollback()
+            await session.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Ошибка при очистке корзины: {str(e)}"
@@ -350,15 +367,19 @@ def setup_cart_endpoints(app: FastAPI):
             request: Request,
             response: Response,
             current_user: Optional[User] = Depends(get_user_or_none),
-            session: Session = Depends(get_session)
+            session: AsyncSession = Depends(get_async_session)
     ):
         """
         Получение полного состояния корзины.
         Включает расчет всех ценовых показателей для каждой позиции и общей суммы.
         """
         # Получение корзины пользователя
-        cart = get_or_create_cart(request, response, session, current_user)
-        cart_items = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
+        cart = await get_or_create_cart(request, response, session, current_user)
+        cart_items = (await session.exec(
+            select(CartItem)
+            .where(CartItem.cart_id == cart.id)
+            .options(CART_ITEM_OPTIONS)
+        )).all()
 
         # Формирование данных позиции
         items_read = [
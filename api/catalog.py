@@ -1,93 +1,180 @@
 from math import ceil
 
-from fastapi import HTTPException, Depends, File, UploadFile, Form, Query
-from sqlalchemy import func
+from fastapi import HTTPException, Depends, File, UploadFile, Form, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, and_, update, case
+from sqlalchemy.orm import joinedload
 from sqlmodel import Session, select
 from typing import List, Optional, Dict
 from pathlib import Path
 from pydantic import TypeAdapter
 import json
 
+from core.catalog_cache import catalog_cache
+from core.catalog_export import iter_catalog_ndjson
+from core.catalog_import import detect_format, import_catalog_file
+from core.catalog_loader import load_drinks, drink_to_read
+from core.config import settings
+from core.drink_sampler import drink_sampler
+from core.facets import facet_index
+from core.http_cache import catalog_response, CachedResponse
+from core.image_gc import IMAGE_FIELDS
+from core.images import upload_image_async
+from core.pagination import encode_cursor, decode_cursor
+from core.pricing import apply_pricing, pricing_fields, refresh_drink_prices
+from core.search import search_index
 from core.s3 import s3_service
+from core.s3_outbox import enqueue_deletion
 from core.translate import generate_section_id
 from id_generator import create_with_unique_id
 from models.models import Section, Drink, DrinkVolumePrice
-from schemas.schemas import SectionRead, DrinkRead, DrinkVolumePriceCreate, SectionWithDrinks, SectionDrinksResponse, DrinkVolumePriceUpdate
+from schemas.schemas import (SectionSummary, DrinkRead, DrinkVolumePriceCreate, SectionWithDrinks, SectionDrinksResponse,
+                             DrinkVolumePriceUpdate, SectionFilterResponse, CatalogImportReport,
+                             DrinkVolumeBulkUpdate, DrinkVolumeBulkResult, DrinkVolumeBulkReport)
 from core.database import get_session
+from core.replicas import get_read_session
 
 def setup_catalog_endpoints(app):
     # Роут для получения всех секций (без напитков)
-    @app.get("/sections/", tags=["Section"], response_model=List[SectionRead])
+    @app.get("/sections/", tags=["Section"], response_model=List[SectionSummary])
     def get_sections(
-            session: Session = Depends(get_session)
+            request: Request,
+            session: Session = Depends(get_read_session)
     ):
-        """Получение всех секций (без напитков)"""
-        sections = session.exec(select(Section)).all()
-        return sections
+        """Получение всех секций (без напитков) с количеством напитков и диапазоном цен"""
+        def load():
+            # Одна агрегация по секциям, напиткам и объемам
+            rows = session.exec(
+                select(
+                    Section.id, Section.title, Section.img_src,
+                    func.count(func.distinct(Drink.id)),
+                    func.count(func.distinct(case((DrinkVolumePrice.quantity > 0, Drink.id)))),
+                    func.min(DrinkVolumePrice.price_final),
+                    func.max(DrinkVolumePrice.price_final)
+                )
+                .outerjoin(Drink, Drink.section_id == Section.id)
+                .outerjoin(DrinkVolumePrice, DrinkVolumePrice.drink_id == Drink.id)
+                .group_by(Section.id, Section.title, Section.img_src)
+            ).all()
+            return [
+                SectionSummary(
+                    id=section_id, title=title, img_src=img_src,
+                    drink_count=drink_count, in_stock_count=in_stock_count,
+                    price_min=price_min, price_max=price_max
+                )
+                for section_id, title, img_src, drink_count, in_stock_count, price_min, price_max in rows
+            ]
+
+        return catalog_response(request, ("sections",), load)
 
 
     @app.get("/sections/{section_id}", tags=["Section"], response_model=SectionWithDrinks)
     def get_section_by_id(
             section_id: str,  # Изменил на str, так как в SectionCreate id - строка
+            request: Request,
             page: int = Query(1, ge=1),
             per_page: int = Query(20, ge=1, le=100),
-            session: Session = Depends(get_session)
+            cursor: Optional[str] = Query(None),  # Токен next_cursor из предыдущего ответа
+            with_total: Optional[bool] = Query(None),  # Считать ли total_drinks/total_pages
+            session: Session = Depends(get_read_session)
     ):
-        """Получение секции с напитками (пагинация по 20 шт)"""
-        # Получаем саму секцию
-        section = session.get(Section, section_id)
-        if not section:
-            raise HTTPException(status_code=404, detail="Section not found")
-
-        # Получаем общее количество напитков в секции
-        total_drinks = session.exec(
-            select(func.count()).select_from(Drink).where(Drink.section_id == section_id)
-        ).one()
-
-        # Получаем напитки с пагинацией
-        stmt = (
-            select(Drink)
-            .where(Drink.section_id == section_id)
-            .offset((page - 1) * per_page)
-            .limit(per_page)
-        )
-        drinks = session.exec(stmt).all()
+        """
+        Получение секции с напитками.
+        Без cursor работает постраничная навигация page/per_page (режим совместимости),
+        с cursor - keyset-пагинация по (section_id, id) без OFFSET.
+        """
+        # По умолчанию общее количество считаем только в постраничном режиме
+        if with_total is None:
+            with_total = cursor is None
+
+        def load():
+            # Получаем саму секцию
+            section = session.get(Section, section_id)
+            if not section:
+                raise HTTPException(status_code=404, detail="Section not found")
+
+            stmt = select(Drink).where(Drink.section_id == section_id).order_by(Drink.id)
+            if cursor is not None:
+                cursor_section_id, last_drink_id = decode_cursor(cursor)
+                if cursor_section_id != section_id:
+                    raise HTTPException(status_code=400, detail="Курсор относится к другой секции")
+                stmt = stmt.where(Drink.id > last_drink_id)
+            else:
+                stmt = stmt.offset((page - 1) * per_page)
+
+            # Берем на один напиток больше, чтобы понять, есть ли следующая страница
+            drinks = load_drinks(session, stmt.limit(per_page + 1))
+            has_more = len(drinks) > per_page
+            drinks = drinks[:per_page]
+
+            # Преобразуем напитки в формат Pydantic
+            drinks_read = [drink_to_read(drink) for drink in drinks]
+
+            total_drinks = None
+            total_pages = None
+            if with_total:
+                # Получаем общее количество напитков в секции
+                total_drinks = session.exec(
+                    select(func.count()).select_from(Drink).where(Drink.section_id == section_id)
+                ).one()
+                total_pages = ceil(total_drinks / per_page)
+
+            return SectionWithDrinks(
+                id=section.id,
+                title=section.title,
+                img_src=section.img_src,
+                drinks=drinks_read,
+                total_drinks=total_drinks,
+                total_pages=total_pages,
+                current_page=page if cursor is None else None,
+                next_cursor=encode_cursor(section_id, drinks[-1].id) if has_more else None
+            )
 
-        # Преобразуем напитки в формат Pydantic
-        drinks_read = []
-        for drink in drinks:
-            drink_dict = {
-                "id": drink.id,
-                "name": drink.name,
-                "ingredients": drink.ingredients,
-                "product_description": drink.product_description,
-                "global_sale": drink.global_sale,
-                "section_id": drink.section_id,
-                "volume_prices": [
-                    {
-                        "id": vp.id,
-                        "img_src": vp.img_src,
-                        "volume": vp.volume,
-                        "price": vp.price,
-                        "quantity": vp.quantity,
-                        "sale": vp.sale
-                    }
-                    for vp in drink.volume_prices
-                ]
-            }
-            drinks_read.append(DrinkRead(**drink_dict))
-
-        total_pages = ceil(total_drinks / per_page)
-
-        return SectionWithDrinks(
-            id=section.id,
-            title=section.title,
-            img_src=section.img_src,
-            drinks=drinks_read,
-            total_drinks=total_drinks,
-            total_pages=total_pages,
-            current_page=page
-        )
+        cache_key = ("section", section_id, page, per_page, cursor, with_total)
+        return catalog_response(request, cache_key, load)
+
+    @app.get("/sections/{section_id}/filter", tags=["Section"], response_model=SectionFilterResponse)
+    def filter_section(
+            section_id: str,
+            request: Request,
+            price_min: Optional[int] = Query(None, ge=0),  # Итоговая цена (со скидкой) от
+            price_max: Optional[int] = Query(None, ge=0),  # и до
+            volume: Optional[List[int]] = Query(None),  # Один или несколько объемов
+            on_sale: bool = Query(False),  # Только со скидкой (sale или global_sale)
+            in_stock: bool = Query(False),  # Только в наличии (quantity > 0)
+            page: int = Query(1, ge=1),
+            per_page: int = Query(20, ge=1, le=100),
+            session: Session = Depends(get_read_session)
+    ):
+        """Фильтрация напитков секции по цене, объему, скидке и наличию со счетчиками фасетов"""
+        def load():
+            section = session.get(Section, section_id)
+            if not section:
+                raise HTTPException(status_code=404, detail="Section not found")
+
+            drink_ids, facets = facet_index.filter(
+                session, section_id,
+                price_min=price_min, price_max=price_max, volumes=volume,
+                on_sale=on_sale, in_stock=in_stock
+            )
+
+            # Загружаем только напитки текущей страницы
+            page_ids = drink_ids[(page - 1) * per_page:page * per_page]
+            drinks = load_drinks(session, select(Drink).where(Drink.id.in_(page_ids)).order_by(Drink.id)) if page_ids else []
+
+            return SectionFilterResponse(
+                id=section.id,
+                title=section.title,
+                img_src=section.img_src,
+                drinks=[drink_to_read(drink) for drink in drinks],
+                total_drinks=len(drink_ids),
+                total_pages=ceil(len(drink_ids) / per_page),
+                current_page=page,
+                facets=facets
+            )
+
+        cache_key = ("filter", section_id, price_min, price_max, tuple(sorted(volume or [])), on_sale, in_stock, page, per_page)
+        return catalog_response(request, cache_key, load)
 
     # Роут для добавления новой секции
     @app.post("/sections", tags=["Section"])
@@ -97,7 +184,7 @@ def setup_catalog_endpoints(app):
         session: Session = Depends(get_session)
     ):
         """Добавление новой секции"""
-        section_id = generate_section_id(title)
+        section_id = await generate_section_id(title)
 
         # Проверяем, существует ли секция с таким ID
         db_section = session.get(Section, section_id)
@@ -108,7 +195,7 @@ def setup_catalog_endpoints(app):
         if image:
             # Генерируем имя файла на основе ID секции
             img_filename = f"{section_id}{Path(image.filename).suffix}"
-            img_src = s3_service.upload_file(image, "sections", img_filename)
+            img_src = await s3_service.upload_file_async(image, "sections", img_filename)
         else:
             # Используем дефолтное изображение, если фото не добавлено
             img_src = "https://zerop-static-storage.storage.yandexcloud.net/sections/default.webp"
@@ -123,6 +210,7 @@ def setup_catalog_endpoints(app):
         # Добавляем секцию в базу данных
         session.add(new_section)
         session.commit()
+        catalog_cache.bump(drink_ids=[])
         session.refresh(new_section)
 
         return new_section
@@ -140,14 +228,13 @@ def setup_catalog_endpoints(app):
             raise HTTPException(status_code=404, detail="Секция не найдена")
 
 
-        # Удаляем изображение секции, если не дефолтное
-        if "default.webp" not in section.img_src:
-            filename = section.img_src.split("/")[-1]
-            s3_service.delete_file("sections", filename)
+        # Изображение секции удалится в фоне после коммита (если не дефолтное)
+        enqueue_deletion(session, [section.img_src])
 
         # Удаляем саму секцию
         session.delete(section)
         session.commit()
+        catalog_cache.bump()
 
         return {"message": f"Секция {section_id} и все её напитки успешно удалены"}
 
@@ -155,39 +242,104 @@ def setup_catalog_endpoints(app):
     @app.get("/product/{drink_id}", tags=["Drinks"], response_model=DrinkRead)
     def get_drink(
             drink_id: int,  # ID напитка
-            session: Session = Depends(get_session)
+            request: Request,
+            session: Session = Depends(get_read_session)
     ):
         """Получение информации о конкретном напитке"""
-        # Находим напиток по ID
-        drink = session.get(Drink, drink_id)
-        if not drink:
-            raise HTTPException(status_code=404, detail="Напиток не найден")
+        def load():
+            # Находим напиток по ID
+            drinks = load_drinks(session, select(Drink).where(Drink.id == drink_id))
+            if not drinks:
+                raise HTTPException(status_code=404, detail="Напиток не найден")
 
-        return drink
+            return drink_to_read(drinks[0])
+
+        return catalog_response(request, ("drink", drink_id), load)
 
     # Роут для получения всех напитков
     @app.get("/drinks/", tags=["Drinks"], response_model=List[DrinkRead])
     def get_drinks(
-            session: Session = Depends(get_session)
+            request: Request,
+            limit: Optional[int] = Query(None, ge=1, le=500),
+            cursor: Optional[str] = Query(None),
+            session: Session = Depends(get_read_session)
+    ):
+        """
+        Получение всех напитков.
+        Если передан limit или cursor, отдается одна страница в порядке (section_id, id),
+        а токен следующей страницы возвращается в заголовке X-Next-Cursor.
+        С заголовком Accept: application/x-ndjson весь каталог отдается потоком, по напитку на строку.
+        """
+        if "application/x-ndjson" in request.headers.get("accept", ""):
+            return StreamingResponse(iter_catalog_ndjson(), media_type="application/x-ndjson")
+
+        if limit is None and cursor is None:
+            def load_all():
+                drinks = load_drinks(session, select(Drink))
+                return [drink_to_read(drink) for drink in drinks]
+
+            return catalog_response(request, ("drinks",), load_all)
+
+        limit = limit or 100
+
+        def load_page():
+            stmt = select(Drink).order_by(Drink.section_id, Drink.id)
+            if cursor is not None:
+                last_section_id, last_drink_id = decode_cursor(cursor)
+                stmt = stmt.where(or_(
+                    Drink.section_id > last_section_id,
+                    and_(Drink.section_id == last_section_id, Drink.id > last_drink_id)
+                ))
+
+            drinks = load_drinks(session, stmt.limit(limit + 1))
+            headers = {}
+            if len(drinks) > limit:
+                drinks = drinks[:limit]
+                headers["X-Next-Cursor"] = encode_cursor(drinks[-1].section_id, drinks[-1].id)
+
+            return CachedResponse.build([drink_to_read(drink) for drink in drinks], headers)
+
+        return catalog_response(request, ("drinks", limit, cursor), load_page)
+
+    @app.get("/drinks/search", tags=["Drinks"], response_model=List[DrinkRead])
+    def search_drinks(
+            request: Request,
+            q: str = Query(..., min_length=1, max_length=200),  # Поисковый запрос
+            limit: int = Query(20, ge=1, le=100),
+            session: Session = Depends(get_read_session)
     ):
-        """Получение всех напитков"""
-        drinks = session.exec(select(Drink)).all()
-        return drinks
+        """Полнотекстовый поиск напитков по названию, составу и описанию (BM25)"""
+        def load():
+            ranked_ids = [drink_id for drink_id, _ in search_index.search(session, q, limit)]
+            if not ranked_ids:
+                return []
+
+            drinks = load_drinks(session, select(Drink).where(Drink.id.in_(ranked_ids)))
+            # Сохраняем порядок по релевантности
+            position = {drink_id: index for index, drink_id in enumerate(ranked_ids)}
+            drinks.sort(key=lambda drink: position[drink.id])
+            return [drink_to_read(drink) for drink in drinks]
+
+        return catalog_response(request, ("search", q.strip().lower(), limit), load)
 
     @app.get("/drinks/random/", tags=["Drinks"], response_model=Dict[str, SectionDrinksResponse])
     def get_random_drinks_by_section(
             limit: int = Query(10, ge=1, le=100),
-            session: Session = Depends(get_session)
+            per_section: Optional[int] = Query(None, ge=1),  # Не больше N напитков из одной секции
+            session: Session = Depends(get_read_session)
     ):
         """Получение случайных напитков, сгруппированных по секциям"""
-        # Получаем случайные напитки с информацией о секции
-        stmt = (
-            select(Drink)
-            .join(Section)
-            .order_by(func.rand())
-            .limit(limit)
+        # Выбираем случайные ID из пула в памяти и загружаем напитки одним пакетом
+        drink_ids = drink_sampler.sample(
+            session, limit, per_section or settings.RANDOM_DRINKS_PER_SECTION
         )
-        drinks = session.exec(stmt).all()
+        drinks = load_drinks(
+            session,
+            select(Drink).where(Drink.id.in_(drink_ids)).options(joinedload(Drink.section))
+        )
+        # Сохраняем случайный порядок выборки
+        position = {drink_id: index for index, drink_id in enumerate(drink_ids)}
+        drinks.sort(key=lambda drink: position[drink.id])
 
         # Группируем напитки по секциям
         result = {}
@@ -200,26 +352,7 @@ def setup_catalog_endpoints(app):
                     "drinks": []
                 }
 
-            drink_data = {
-                "id": drink.id,
-                "name": drink.name,
-                "ingredients": drink.ingredients,
-                "product_description": drink.product_description,
-                "global_sale": drink.global_sale,
-                "section_id": drink.section_id,
-                "volume_prices": [
-                    {
-                        "id": vp.id,
-                        "volume": vp.volume,
-                        "price": vp.price,
-                        "quantity": vp.quantity,
-                        "sale": vp.sale,
-                        "img_src": vp.img_src
-                    }
-                    for vp in drink.volume_prices
-                ]
-            }
-            result[section_id]["drinks"].append(drink_data)
+            result[section_id]["drinks"].append(drink_to_read(drink))
 
         return result
 
@@ -268,30 +401,47 @@ def setup_catalog_endpoints(app):
 
         # Сохранение изображения
         if image:
-            img_filename = f"{new_drink.id}{Path(image.filename).suffix}"
-            new_drink.img_src = s3_service.upload_file(image, "products", img_filename)
+            # Оригинал и WebP-варианты (миниатюра, карточка) генерируются вне event loop
+            for field, value in (await upload_image_async(image, "products")).items():
+                setattr(new_drink, field, value)
         else:
             new_drink.img_src = "https://zerop-static-storage.storage.yandexcloud.net/products/default.webp"
 
         session.commit()
 
-        # Добавляем объемы и цены
-        for volume_price in volume_prices_validated:
-            new_volume_price = DrinkVolumePrice.create(
-                session,
+        # Добавляем объемы и цены (одним многострочным INSERT)
+        DrinkVolumePrice.create_many(session, [
+            dict(
                 drink_id=new_drink.id,
                 volume=volume_price.volume,
                 price=volume_price.price,
                 quantity=volume_price.quantity,
                 sale=volume_price.sale,
-                img_src=new_drink.img_src
+                img_src=new_drink.img_src,
+                img_thumb_src=new_drink.img_thumb_src,
+                img_card_src=new_drink.img_card_src,
+                **pricing_fields(volume_price.price, volume_price.sale, global_sale)
             )
-            session.add(new_volume_price)
+            for volume_price in volume_prices_validated
+        ])
 
         session.commit()
+        catalog_cache.bump(drink_ids=[new_drink.id])
         return new_drink
 
 
+    # Роут для пакетного импорта каталога из файла
+    @app.post("/drinks/import", tags=["Drinks"], response_model=CatalogImportReport)
+    def import_drinks(
+            file: UploadFile = File(...),  # CSV (строка на объем) или JSONL (строка на напиток)
+            file_format: Optional[str] = Form(None, alias="format", pattern="^(csv|jsonl)$"),
+            batch_size: int = Form(settings.CATALOG_IMPORT_BATCH_SIZE, ge=1, le=10000),
+            session: Session = Depends(get_session)
+    ):
+        """Пакетный upsert напитков и объемов из CSV/JSONL с отчетом по строкам"""
+        fmt = file_format or detect_format(file.filename)
+        return import_catalog_file(session, file.file, fmt, batch_size)
+
     # Роут для обновления напитка (только глобальные поля)
     @app.patch("/drinks/{drink_id}", tags=["Drinks"], response_model=DrinkRead)
     async def update_drink(
@@ -328,23 +478,27 @@ def setup_catalog_endpoints(app):
                 raise HTTPException(status_code=404, detail="Секция не найдена")
             db_drink.section_id = section_id
 
+        # Смена глобальной скидки меняет итоговые цены всех объемов напитка
+        if global_sale is not None:
+            refresh_drink_prices(session, [drink_id])
+
         # Работа с изображением
         if image:
-            # Если предоставлено новое изображение, удаляем старое (если оно не дефолтное)
-            if db_drink.img_src and "default.webp" not in db_drink.img_src:
-                old_filename = db_drink.img_src.split("/")[-1]
-                s3_service.delete_file("products", old_filename)
-
-            # Сохраняем новое изображение
-            img_filename = f"{db_drink.id}{Path(image.filename).suffix}"
-            db_drink.img_src = s3_service.upload_file(image, "products", img_filename)
+            # Сохраняем новое изображение и его WebP-варианты (ключи по хэшу содержимого)
+            images = await upload_image_async(image, "products")
+            # Старые файлы удалятся после коммита, если на них больше никто не ссылается
+            enqueue_deletion(session, [getattr(db_drink, field) for field in IMAGE_FIELDS])
+            for field, value in images.items():
+                setattr(db_drink, field, value)
 
             # Обновляем изображение для всех объемов, которые используют изображение напитка
             for volume in db_drink.volume_prices:
                 if not volume.img_src or "default.webp" in volume.img_src:
-                    volume.img_src = db_drink.img_src
+                    for field, value in images.items():
+                        setattr(volume, field, value)
 
         session.commit()
+        catalog_cache.bump(drink_ids=[drink_id])
         session.refresh(db_drink)
 
         return db_drink
@@ -365,18 +519,80 @@ def setup_catalog_endpoints(app):
             raise HTTPException(status_code=404, detail="Напиток не найден")
 
 
-        # Удаляем основное изображение напитка, если оно не является дефолтным
-        if db_drink.img_src and "default.webp" not in db_drink.img_src:
-            filename = db_drink.img_src.split("/")[-1]
-            s3_service.delete_file("products", filename)
+        # Изображения напитка и его объемов (могут быть общими с другими товарами) удалятся в фоне
+        enqueue_deletion(session, [getattr(item, field) for item in (db_drink, *db_drink.volume_prices)
+                                   for field in IMAGE_FIELDS])
 
         # Удаляем сам напиток из базы данных
         session.delete(db_drink)
         session.commit()
+        catalog_cache.bump(drink_ids=[drink_id])
 
         # Возвращаем сообщение об успешном удалении
         return {"message": "Напиток успешно удален"}
 
+    # Роут для пакетного обновления цен и остатков (синхронизация со складом)
+    @app.patch("/drinks/volumes/bulk", tags=["Drinks"], response_model=DrinkVolumeBulkReport)
+    def bulk_update_drink_volumes(
+            data: DrinkVolumeBulkUpdate,
+            session: Session = Depends(get_session)
+    ):
+        """
+        Обновление price/quantity/sale у множества объемов одной транзакцией.
+        Возвращает результат по каждой строке; кэш каталога сбрасывается один раз.
+        """
+        if len(data.items) > settings.CATALOG_BULK_UPDATE_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Не более {settings.CATALOG_BULK_UPDATE_MAX_ITEMS} строк за один запрос"
+            )
+
+        # Текущие цены и владельцы всех объемов - одним запросом
+        volume_ids = {item.volume_id for item in data.items}
+        current = {
+            row.id: row._asdict() for row in session.exec(
+                select(DrinkVolumePrice.id, DrinkVolumePrice.drink_id, DrinkVolumePrice.price,
+                       DrinkVolumePrice.sale, Drink.global_sale)
+                .join(Drink, DrinkVolumePrice.drink_id == Drink.id)
+                .where(DrinkVolumePrice.id.in_(volume_ids))
+            ).all()
+        } if volume_ids else {}
+
+        report = DrinkVolumeBulkReport()
+        rows = []
+        for item in data.items:
+            values = item.model_dump(exclude={"volume_id"}, exclude_none=True)
+            if item.volume_id not in current:
+                error, status = "Объем не найден", "not_found"
+            elif not values:
+                error, status = "Нет полей для обновления", "invalid"
+            elif any(value < 0 for value in values.values()):
+                error, status = "Значения не могут быть отрицательными", "invalid"
+            elif values.get("sale", 0) > 100:
+                error, status = "Скидка не может превышать 100%", "invalid"
+            else:
+                error, status = None, "updated"
+
+            report.results.append(DrinkVolumeBulkResult(volume_id=item.volume_id, status=status, error=error))
+            if error:
+                report.failed += 1
+            else:
+                report.updated += 1
+                if "price" in values or "sale" in values:
+                    # Пересчитываем итоговую цену (повторные строки по объему учитывают предыдущие)
+                    state = current[item.volume_id]
+                    state.update({key: values[key] for key in ("price", "sale") if key in values})
+                    values.update(pricing_fields(state["price"], state["sale"], state["global_sale"]))
+                rows.append({"id": item.volume_id, **values})
+
+        if rows:
+            # Пакетный UPDATE по первичному ключу (строки группируются по набору колонок)
+            session.execute(update(DrinkVolumePrice), rows)
+            session.commit()
+            catalog_cache.bump(drink_ids=list({current[row["id"]]["drink_id"] for row in rows}))
+
+        return report
+
     # Роут для обновления конкретного объема напитка
     @app.patch("/drinks/{drink_id}/volumes/{volume_id}", tags=["Drinks"], response_model=DrinkVolumePrice)
     async def update_drink_volume(
@@ -407,19 +623,19 @@ def setup_catalog_endpoints(app):
             volume_price.quantity = volume_data.quantity
         if volume_data.sale is not None:
             volume_price.sale = volume_data.sale
+        apply_pricing(volume_price, drink.global_sale)
 
         # Работа с изображением
         if image:
-            # Удаляем старое изображение, если оно не дефолтное
-            if volume_price.img_src and "default.webp" not in volume_price.img_src:
-                old_filename = volume_price.img_src.split("/")[-1]
-                s3_service.delete_file("products/volumes", old_filename)
-
-            # Сохраняем новое изображение
-            img_filename = f"{drink_id}_{volume_id}{Path(image.filename).suffix}"
-            volume_price.img_src = s3_service.upload_file(image, "products/volumes", img_filename)
+            # Сохраняем новое изображение и его WebP-варианты (ключи по хэшу содержимого)
+            images = await upload_image_async(image, "products/volumes")
+            # Старые файлы удалятся после коммита, если на них больше никто не ссылается
+            enqueue_deletion(session, [getattr(volume_price, field) for field in IMAGE_FIELDS])
+            for field, value in images.items():
+                setattr(volume_price, field, value)
 
         session.commit()
+        catalog_cache.bump(drink_ids=[drink_id])
         session.refresh(volume_price)
 
         return volume_price
@@ -439,25 +655,24 @@ def setup_catalog_endpoints(app):
         if not drink:
             raise HTTPException(status_code=404, detail="Напиток не найден")
 
-        # Создаем новый объем
-        new_volume = DrinkVolumePrice(
+        # Изображение напитка по умолчанию или загруженное для объема
+        images = {"img_src": drink.img_src, "img_thumb_src": drink.img_thumb_src, "img_card_src": drink.img_card_src}
+        if image:
+            images = await upload_image_async(image, "products/volumes")
+
+        # Создаем новый объем (ID из блока id_generator, как у всех моделей с IDMixin)
+        new_volume = DrinkVolumePrice.create(
+            session,
             drink_id=drink_id,
             volume=volume_data.volume,
             price=volume_data.price,
             quantity=volume_data.quantity,
             sale=volume_data.sale,
-            img_src=drink.img_src  # Используем изображение напитка по умолчанию
+            **images,
+            **pricing_fields(volume_data.price, volume_data.sale, drink.global_sale)
         )
-
-        # Если предоставлено изображение
-        if image:
-            # Генерируем уникальный ID для нового объема
-            new_volume_id = create_with_unique_id(session, DrinkVolumePrice)
-            img_filename = f"{drink_id}_{new_volume_id}{Path(image.filename).suffix}"
-            new_volume.img_src = s3_service.upload_file(image, "products/volumes", img_filename)
-
-        session.add(new_volume)
         session.commit()
+        catalog_cache.bump(drink_ids=[drink_id])
         session.refresh(new_volume)
 
         return new_volume
@@ -481,13 +696,12 @@ def setup_catalog_endpoints(app):
         if not volume_price or volume_price.drink_id != drink_id:
             raise HTTPException(status_code=404, detail="Объем не найден для этого напитка")
 
-        # Удаляем изображение, если оно не дефолтное
-        if volume_price.img_src and "default.webp" not in volume_price.img_src:
-            filename = volume_price.img_src.split("/")[-1]
-            s3_service.delete_file("products/volumes", filename)
+        # Изображение объема может быть общим с напитком или другими объемами, удаляется в фоне
+        enqueue_deletion(session, [getattr(volume_price, field) for field in IMAGE_FIELDS])
 
         # Удаляем объем
         session.delete(volume_price)
         session.commit()
+        catalog_cache.bump(drink_ids=[drink_id])
 
         return {"message": "Объем напитка успешно удален"}
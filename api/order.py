@@ -4,9 +4,12 @@ from typing import List, Dict, Optional, Any
 
 # 2. Библиотеки сторонних пакетов
 from fastapi import FastAPI, HTTPException, Depends, Response, Query
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select, func, delete, Field
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
+from core.catalog_loader import load_drinks
 from core.delivery_slots import ensure_slots_for_date
 # 3. Локальные модули
 # Зависимости и функции для работы с пользователем
@@ -22,7 +25,8 @@ from schemas.address import AddressRead, StoreAddressRead
 from schemas.cart import (OrderRead, OrderStatus, DeliveryType, OrderItemRead, OrderCreateResponse, OrderCreateRequest)
 from schemas.schemas import DrinkRead  # Импорт новой схемы
 # База данных
-from core.database import get_session
+from core.database import engine, get_session, get_async_session
+from core.replicas import get_read_session
 
 
 def setup_order_endpoints(app: FastAPI):
@@ -33,16 +37,21 @@ def setup_order_endpoints(app: FastAPI):
     async def create_order(
             order_data: OrderCreateRequest,
             current_user: int = Depends(get_current_user),
-            session: Session = Depends(get_session)
+            session: AsyncSession = Depends(get_async_session)
     ):
         """Создание нового заказа с сохранением данных доставки в таблицу DeliveryInfo"""
 
         # 1. Проверка корзины и товаров
-        cart = session.exec(select(Cart).where(Cart.user_id == current_user.id)).first()
+        cart = (await session.exec(select(Cart).where(Cart.user_id == current_user.id))).first()
         if not cart:
             raise HTTPException(status_code=400, detail="Корзина не найдена")
 
-        cart_items = session.exec(select(CartItem).where(CartItem.cart_id == cart.id)).all()
+        # Объемы позиций подгружаем одним запросом: цена и скидка уже материализованы в них
+        cart_items = (await session.exec(
+            select(CartItem)
+            .where(CartItem.cart_id == cart.id)
+            .options(selectinload(CartItem.drink_volume_price))
+        )).all()
         if not cart_items:
             raise HTTPException(status_code=400, detail="Корзина пуста")
 
@@ -52,7 +61,7 @@ def setup_order_endpoints(app: FastAPI):
         order_total = order_subtotal - order_discount + order_data.delivery_price
 
         # 3. Получение данных пользователя
-        user = session.get(User, current_user.id)
+        user = await session.get(User, current_user.id)
         customer_name = f"{user.last_name} {user.first_name} {user.middle_name}".strip()
         customer_phone = user.phone
 
@@ -64,11 +73,11 @@ def setup_order_endpoints(app: FastAPI):
 
         if order_data.delivery_type == DeliveryType.COURIER:
             # Проверка адреса доставки
-            address = session.exec(
+            address = (await session.exec(
                 select(Address)
                 .where(Address.user_id == current_user.id)
                 .order_by(Address.is_default.desc())
-            ).first()
+            )).first()
             if not address:
                 raise HTTPException(status_code=400, detail="Не указан адрес доставки")
 
@@ -85,7 +94,7 @@ def setup_order_endpoints(app: FastAPI):
             if not order_data.time_slot_id:
                 raise HTTPException(400, "Не указан ID временного слота")
 
-            slot = session.get(DeliveryTimeSlot, order_data.time_slot_id)
+            slot = await session.get(DeliveryTimeSlot, order_data.time_slot_id)
             if not slot:
                 raise HTTPException(400, "Указанный слот доставки не найден")
 
@@ -108,12 +117,12 @@ def setup_order_endpoints(app: FastAPI):
             if not order_data.store_address_id:
                 raise HTTPException(status_code=400, detail="Не выбран магазин самовывоза")
 
-            store_address = session.get(StoreAddress, order_data.store_address_id)
+            store_address = await session.get(StoreAddress, order_data.store_address_id)
             if not store_address:
                 raise HTTPException(status_code=400, detail="Магазин не найден")
 
         # 5. Создание заказа (Order)
-        order = Order.create(
+        order = await Order.create_async(
             session,
             user_id=current_user.id,
             delivery_type=order_data.delivery_type,
@@ -126,10 +135,10 @@ def setup_order_endpoints(app: FastAPI):
             created_at=datetime.now(UTC)
         )
         session.add(order)
-        session.flush()  # Получаем ID заказа
+        await session.flush()  # Получаем ID заказа
 
         # 6. Создание записи о доставке (DeliveryInfo)
-        delivery_info = DeliveryInfo.create(
+        delivery_info = await DeliveryInfo.create_async(
             session,
             order_id=order.id,
             time_slot_id=order_data.time_slot_id if order_data.delivery_type == DeliveryType.COURIER else None,
@@ -143,27 +152,27 @@ def setup_order_endpoints(app: FastAPI):
         )
         session.add(delivery_info)
 
-        # 7. Перенос товаров в заказ
-        for item in cart_items:
-            order_item = OrderItem.create(
-                session,
+        # 7. Перенос товаров в заказ (одним многострочным INSERT)
+        await OrderItem.create_many_async(session, [
+            dict(
                 order_id=order.id,
                 drink_id=item.drink_id,
                 drink_volume_price_id=item.drink_volume_price_id,
                 quantity=item.quantity,
                 volume=item.drink_volume_price.volume,
                 price_original=item.drink_volume_price.price,
-                sale=item.drink_volume_price.sale or item.drink_volume_price.drink.global_sale or 0,
+                sale=item.drink_volume_price.effective_sale,
                 price_final=item.price_final,
                 item_subtotal=item.item_subtotal,
                 item_discount=item.item_discount,
                 item_total=item.item_total,
             )
-            session.add(order_item)
+            for item in cart_items
+        ])
 
         # 8. Очистка корзины
-        session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
-        session.commit()
+        await session.exec(delete(CartItem).where(CartItem.cart_id == cart.id))
+        await session.commit()
 
         # 9. Формирование ответа
         return {
@@ -178,7 +187,7 @@ def setup_order_endpoints(app: FastAPI):
     def get_order_items(
             order_id: int,
             current_user: dict = Depends(get_current_user),
-            session: Session = Depends(get_session)
+            session: Session = Depends(get_read_session)
     ):
         """Получить список товаров в заказе"""
         order = session.get(Order, order_id)
@@ -247,7 +256,7 @@ def setup_order_endpoints(app: FastAPI):
     @app.get("/orders/my", response_model=Dict[str, Any])
     async def get_my_orders(
             current_user: int = Depends(get_current_user),
-            session: Session = Depends(get_session),
+            session: Session = Depends(get_read_session),
             page: int = Query(1, ge=1),
             limit: int = Query(9, ge=1, le=100)
     ):
@@ -319,7 +328,7 @@ def setup_order_endpoints(app: FastAPI):
     @app.get("/orders/my/drinks", response_model=Dict[str, Any])
     async def get_my_purchased_drinks(
             current_user: int = Depends(get_current_user),
-            session: Session = Depends(get_session),
+            session: Session = Depends(get_read_session),
             page: int = Query(1, ge=1),
             limit: int = Query(9, ge=1, le=100)
     ):
@@ -341,22 +350,17 @@ def setup_order_endpoints(app: FastAPI):
         total = len(drink_ids)
 
         # Получаем полную информацию о напитках с пагинацией
-        drinks = session.exec(
+        drinks = load_drinks(
+            session,
             select(Drink)
             .where(Drink.id.in_(drink_ids))
             .offset(skip)
             .limit(limit)
-        ).all()
+        )
 
         # Формируем ответ с полной информацией о напитках
         result = []
         for drink in drinks:
-            # Получаем все варианты объема/цены для напитка
-            volume_prices = session.exec(
-                select(DrinkVolumePrice)
-                .where(DrinkVolumePrice.drink_id == drink.id)
-            ).all()
-
             # Используем новую схему DrinkRead для сериализации
             drink_data = DrinkRead(
                 id=drink.id,
@@ -365,6 +369,9 @@ def setup_order_endpoints(app: FastAPI):
                 product_description=drink.product_description,
                 global_sale=drink.global_sale,
                 section_id=drink.section_id,
+                img_src=drink.img_src,
+                img_thumb_src=drink.img_thumb_src,
+                img_card_src=drink.img_card_src,
                 volume_prices=[
                     {
                         "id": vp.id,
@@ -372,9 +379,11 @@ def setup_order_endpoints(app: FastAPI):
                         "volume": vp.volume,
                         "price": vp.price,
                         "quantity": vp.quantity,
-                        "sale": vp.sale
+                        "sale": vp.sale,
+                        "img_thumb_src": vp.img_thumb_src if vp.img_src else drink.img_thumb_src,
+                        "img_card_src": vp.img_card_src if vp.img_src else drink.img_card_src
                     }
-                    for vp in volume_prices
+                    for vp in drink.volume_prices
                 ]
             )
             result.append(drink_data)
@@ -387,7 +396,7 @@ def setup_order_endpoints(app: FastAPI):
     @app.get("/delivery/slots/")
     async def get_delivery_slots(
             delivery_date: date,
-            db: Session = Depends(get_session)
+            db: Session = Depends(get_read_session)
     ):
         """Получение слотов на указанную дату (с автоматической генерацией при первом запросе)"""
         # Проверяем существующие слоты
@@ -396,9 +405,14 @@ def setup_order_endpoints(app: FastAPI):
             .where(DeliveryTimeSlot.date == delivery_date)
         ).all()
 
-        # Если слотов нет — генерируем
+        # Если слотов нет — генерируем в основной БД (реплика могла еще не получить созданные слоты,
+        # поэтому перед генерацией проверяем еще раз - иначе удалили бы слоты с уже принятыми заказами)
         if not existing_slots:
-            existing_slots = ensure_slots_for_date(db, delivery_date)
+            with Session(engine, expire_on_commit=False) as primary:
+                existing_slots = primary.exec(
+                    select(DeliveryTimeSlot)
+                    .where(DeliveryTimeSlot.date == delivery_date)
+                ).all() or ensure_slots_for_date(primary, delivery_date)
 
         return [{
             "id": slot.id,
@@ -91,9 +91,10 @@ def setup_password_endpoints(app):
         if data.old_password == data.new_password:
             raise HTTPException(status_code=400, detail="Новый пароль не должен совпадать с старым")
 
-        # Обновление пароля
-        current_user.hashed_password = hash_password(data.new_password)
-        session.add(current_user)
+        # Обновление пароля (current_user загружен в другой сессии - меняем копию из текущей)
+        db_user = session.get(User, current_user.id)
+        db_user.hashed_password = hash_password(data.new_password)
+        session.add(db_user)
         session.commit()
 
         return {"message": "Пароль успешно изменён"}
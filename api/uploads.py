@@ -0,0 +1,123 @@
+import re
+import uuid
+from pathlib import Path
+
+from fastapi import HTTPException, Depends
+from sqlmodel import Session
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+from core.database import get_session
+from core.image_gc import IMAGE_FIELDS
+from core.images import IMMUTABLE_CACHE_CONTROL
+from core.s3 import s3_service
+from core.s3_outbox import enqueue_deletion
+from models.models import Section, Drink, DrinkVolumePrice
+from schemas.schemas import ImageTarget, ImageUploadRequest, PresignedUpload, ImageUploadFinalize, AttachedImage
+
+# Папка в бакете для каждого типа объекта
+IMAGE_FOLDERS = {
+    ImageTarget.DRINK: "products",
+    ImageTarget.VOLUME: "products/volumes",
+    ImageTarget.SECTION: "sections",
+}
+
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/avif", "image/svg+xml"}
+
+
+def _key_pattern(target: ImageTarget) -> re.Pattern:
+    """Ключи, которые выдает presign: {папка}/{uuid}.{расширение}"""
+    return re.compile(rf"{re.escape(IMAGE_FOLDERS[target])}/[0-9a-f]{{32}}\.[a-z0-9]{{1,5}}")
+
+
+def setup_upload_endpoints(app):
+    # Роут для получения подписанной формы прямой загрузки изображения в хранилище
+    @app.post("/uploads/images/presign", tags=["Uploads"], response_model=PresignedUpload)
+    def presign_image_upload(data: ImageUploadRequest):
+        """
+        Выдает подписанную POST-политику: браузер загружает файл прямо в Object Storage,
+        после чего вызывает /uploads/images/finalize. Сервер содержимое файла не получает.
+        """
+        if data.content_type not in ALLOWED_IMAGE_TYPES:
+            raise HTTPException(status_code=400, detail="Неподдерживаемый тип изображения")
+        max_size = settings.IMAGE_UPLOAD_MAX_MB * 1024 * 1024
+        if data.size > max_size:
+            raise HTTPException(status_code=413, detail=f"Файл больше {settings.IMAGE_UPLOAD_MAX_MB} МБ")
+
+        ext = Path(data.filename).suffix.lower()
+        if not re.fullmatch(r"\.[a-z0-9]{1,5}", ext):
+            raise HTTPException(status_code=400, detail="Некорректное расширение файла")
+
+        # Случайный ключ никогда не перезаписывается, поэтому файл можно кэшировать бессрочно
+        key = f"{IMAGE_FOLDERS[data.target]}/{uuid.uuid4().hex}{ext}"
+        post = s3_service.presigned_post(
+            key, data.content_type, max_size, settings.IMAGE_UPLOAD_EXPIRES_SECONDS, IMMUTABLE_CACHE_CONTROL
+        )
+        return PresignedUpload(
+            key=key,
+            url=post["url"],
+            fields=post["fields"],
+            expires_in=settings.IMAGE_UPLOAD_EXPIRES_SECONDS,
+            img_src=s3_service.public_url(key)
+        )
+
+    # Роут для привязки загруженного изображения к напитку, объему или секции
+    @app.post("/uploads/images/finalize", tags=["Uploads"], response_model=AttachedImage)
+    def finalize_image_upload(
+            data: ImageUploadFinalize,
+            session: Session = Depends(get_session)
+    ):
+        """
+        Проверяет, что файл загружен (HEAD-запрос, содержимое не читается), и прикрепляет его.
+        Старое изображение удаляется в фоне, если на него больше никто не ссылается.
+        Файлы, которые так и не прикрепили, удаляет python -m core.image_gc.
+        """
+        if not _key_pattern(data.target).fullmatch(data.key):
+            raise HTTPException(status_code=400, detail="Некорректный ключ файла")
+
+        head = s3_service.head(data.key)
+        if head is None:
+            raise HTTPException(status_code=404, detail="Файл не найден в хранилище")
+        if not head.get("ContentType", "").startswith("image/"):
+            raise HTTPException(status_code=400, detail="Файл не является изображением")
+
+        # Варианты WebP не строятся: для этого пришлось бы скачать файл на сервер
+        images = {"img_src": s3_service.public_url(data.key), "img_thumb_src": None, "img_card_src": None}
+
+        if data.target == ImageTarget.SECTION:
+            section = session.get(Section, str(data.target_id))
+            if not section:
+                raise HTTPException(status_code=404, detail="Секция не найдена")
+            enqueue_deletion(session, [section.img_src])
+            section.img_src = images["img_src"]
+            drink_ids = []
+        else:
+            try:
+                target_id = int(data.target_id)
+            except ValueError:
+                raise HTTPException(status_code=422, detail="ID напитка или объема должен быть числом")
+
+            if data.target == ImageTarget.DRINK:
+                item = session.get(Drink, target_id)
+                if not item:
+                    raise HTTPException(status_code=404, detail="Напиток не найден")
+                drink_ids = [item.id]
+                # Объемы без своего изображения используют изображение напитка
+                for volume in item.volume_prices:
+                    if not volume.img_src or "default.webp" in volume.img_src:
+                        for field, value in images.items():
+                            setattr(volume, field, value)
+            else:
+                item = session.get(DrinkVolumePrice, target_id)
+                if not item:
+                    raise HTTPException(status_code=404, detail="Объем не найден")
+                drink_ids = [item.drink_id]
+
+            enqueue_deletion(session, [getattr(item, field) for field in IMAGE_FIELDS])
+            for field, value in images.items():
+                setattr(item, field, value)
+
+        session.commit()
+        catalog_cache.bump(drink_ids=drink_ids)
+
+        return AttachedImage(target=data.target, target_id=data.target_id, img_src=images["img_src"])
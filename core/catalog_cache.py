@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, List, Optional
+
+from core.config import settings
+
+
+class CatalogCache:
+    """
+    In-process снимок каталога с версией.
+
+    Каталог меняется только через админские эндпоинты, поэтому ответы на чтение
+    (секции, страницы секций, напитки) кэшируются в памяти процесса.
+    Любое изменение каталога вызывает bump(): версия растет, снимок сбрасывается.
+    Число записей ограничено, при переполнении вытесняются давно не читавшиеся (LRU).
+    Производные индексы (поиск и т.п.) подписываются на bump() через subscribe().
+    TTL страхует от устаревания между воркерами и при изменении остатков через корзину.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._version = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Optional[List[int]]], None]] = []
+
+    @property
+    def version(self) -> int:
+        """Текущая версия каталога (монотонно растет)"""
+        return self._version
+
+    def subscribe(self, listener: Callable[[Optional[List[int]]], None]):
+        """Регистрирует обработчик, вызываемый при каждом изменении каталога"""
+        self._listeners.append(listener)
+
+    def bump(self, drink_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Фиксирует изменение каталога: увеличивает версию и сбрасывает снимок.
+
+        :param drink_ids: ID затронутых напитков (None - изменения могли затронуть любой напиток)
+        """
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            version = self._version
+
+        changed = list(drink_ids) if drink_ids is not None else None
+        for listener in self._listeners:
+            listener(changed)
+        return version
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Возвращает значение из снимка или загружает его через loader() и сохраняет"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            version = self._version
+
+        # Загрузка идет вне блокировки, чтобы не задерживать другие чтения
+        value = loader()
+
+        with self._lock:
+            # Если каталог изменился во время загрузки - результат мог устареть, не сохраняем
+            if self._version == version:
+                self._entries[key] = (now + self.ttl_seconds, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+
+# Общий экземпляр кэша каталога для процесса
+catalog_cache = CatalogCache(
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS
+)
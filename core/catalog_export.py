@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Iterator, Optional, Tuple
+
+from pydantic_core import to_json
+from sqlalchemy import and_, or_
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.database import engine
+from core.images import build_srcset
+from models.models import Drink, DrinkVolumePrice
+
+
+def iter_catalog_ndjson(batch_size: int = settings.CATALOG_EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Потоковая выгрузка каталога в NDJSON: одна строка - один напиток со всеми объемами.
+
+    Напитки читаются пакетами по batch_size с продолжением по ключу (section_id, id),
+    объемы - вторым запросом для напитков пакета; ORM-объекты не создаются.
+    Серверный курсор (yield_per) не подходит: mysql-connector буферизует весь результат на клиенте.
+    В памяти одновременно находится только один пакет.
+
+    Каждый пакет читается в своей короткой сессии: соединение не занято, пока клиент
+    дочитывает ответ. Зависимость Depends(get_session) тоже не подошла бы - она
+    закрывается раньше, чем StreamingResponse дочитает генератор.
+    """
+    last: Optional[Tuple[str, int]] = None
+    while True:
+        stmt = (
+            select(
+                Drink.id, Drink.name, Drink.ingredients, Drink.product_description, Drink.global_sale,
+                Drink.section_id, Drink.img_src, Drink.img_thumb_src, Drink.img_card_src
+            )
+            .order_by(Drink.section_id, Drink.id)
+            .limit(batch_size)
+        )
+        if last is not None:
+            last_section_id, last_drink_id = last
+            stmt = stmt.where(or_(
+                Drink.section_id > last_section_id,
+                and_(Drink.section_id == last_section_id, Drink.id > last_drink_id)
+            ))
+
+        with Session(engine) as session:
+            drinks = session.exec(stmt).all()
+            if not drinks:
+                return
+            volumes = defaultdict(list)
+            volume_rows = session.exec(
+                select(
+                    DrinkVolumePrice.drink_id, DrinkVolumePrice.id, DrinkVolumePrice.img_src, DrinkVolumePrice.volume,
+                    DrinkVolumePrice.price, DrinkVolumePrice.quantity, DrinkVolumePrice.sale,
+                    DrinkVolumePrice.img_thumb_src, DrinkVolumePrice.img_card_src
+                )
+                .where(DrinkVolumePrice.drink_id.in_([drink[0] for drink in drinks]))
+                .order_by(DrinkVolumePrice.drink_id, DrinkVolumePrice.id)
+            )
+            for drink_id, volume_id, img_src, volume, price, quantity, sale, thumb_src, card_src in volume_rows:
+                volumes[drink_id].append({
+                    "id": volume_id,
+                    "img_src": img_src,
+                    "volume": volume,
+                    "price": price,
+                    "quantity": quantity,
+                    "sale": sale,
+                    "img_thumb_src": thumb_src,
+                    "img_card_src": card_src,
+                    "img_srcset": build_srcset(thumb_src, card_src),
+                })
+
+        chunk = []
+        for (drink_id, name, ingredients, description, global_sale, section_id,
+             img_src, thumb_src, card_src) in drinks:
+            # Порядок полей как в DrinkRead
+            chunk.append(to_json({
+                "name": name,
+                "ingredients": ingredients,
+                "product_description": description,
+                "global_sale": global_sale,
+                "section_id": section_id,
+                "volume_prices": volumes.get(drink_id, []),
+                "id": drink_id,
+                "img_src": img_src,
+                "img_thumb_src": thumb_src,
+                "img_card_src": card_src,
+                "img_srcset": build_srcset(thumb_src, card_src),
+            }))
+        yield b"\n".join(chunk) + b"\n"
+
+        if len(drinks) < batch_size:
+            return
+        last = (drinks[-1][5], drinks[-1][0])
@@ -0,0 +1,229 @@
+import argparse
+import csv
+import io
+import json
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+from core.pricing import pricing_fields, refresh_drink_prices
+from models.models import Drink, DrinkVolumePrice, Section
+from schemas.schemas import CatalogImportReport, DrinkCreate, ImportRowError
+
+DEFAULT_PRODUCT_IMG = "https://zerop-static-storage.storage.yandexcloud.net/products/default.webp"
+
+# Колонки CSV: одна строка - один вариант (объем/цена) напитка
+CSV_DRINK_FIELDS = ("name", "ingredients", "product_description", "section_id", "global_sale")
+CSV_VOLUME_FIELDS = ("volume", "price", "quantity", "sale", "img_src")
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """Определение формата файла по расширению (csv или jsonl)"""
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def _csv_row_to_drink(row: Dict[str, str]) -> dict:
+    """Преобразует строку CSV в структуру DrinkCreate (пустые значения -> None)"""
+    clean = {key.strip(): (value.strip() or None) if isinstance(value, str) else value for key, value in row.items() if key}
+    drink = {field: clean.get(field) for field in CSV_DRINK_FIELDS}
+    drink["volume_prices"] = [{field: clean.get(field) for field in CSV_VOLUME_FIELDS}]
+    return drink
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Потоково читает файл и отдает пары (номер строки, данные).
+    Вместо данных может быть исключение - тогда строка попадет в отчет об ошибках.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, _csv_row_to_drink(row)
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, e
+
+
+class CatalogImporter:
+    """
+    Пакетный upsert напитков и их объемов.
+
+    Напиток определяется парой (section_id, name), объем - парой (drink_id, volume).
+    Строки копятся в пакеты по batch_size и записываются несколькими многострочными
+    INSERT/UPDATE на пакет, каждый пакет - отдельная транзакция.
+    """
+
+    def __init__(self, session: Session, batch_size: int = settings.CATALOG_IMPORT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self.report = CatalogImportReport()
+        self.touched_drink_ids: set[int] = set()
+        self._section_ids = set(session.exec(select(Section.id)).all())
+
+    def run(self, stream: TextIO, fmt: str) -> CatalogImportReport:
+        started = time.perf_counter()
+        batch: List[Tuple[int, DrinkCreate]] = []
+
+        for line_no, data in iter_rows(stream, fmt):
+            self.report.total_rows += 1
+            drink = self._validate(line_no, data)
+            if drink is None:
+                continue
+            batch.append((line_no, drink))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+        if batch:
+            self._flush(batch)
+
+        if self.touched_drink_ids:
+            catalog_cache.bump(drink_ids=list(self.touched_drink_ids))
+
+        self.report.elapsed_seconds = round(time.perf_counter() - started, 3)
+        if self.report.elapsed_seconds:
+            self.report.rows_per_second = round(self.report.total_rows / self.report.elapsed_seconds, 1)
+        return self.report
+
+    def _fail(self, line_no: int, error: str):
+        self.report.failed_rows += 1
+        self.report.errors.append(ImportRowError(line=line_no, error=error))
+
+    def _validate(self, line_no: int, data: object) -> Optional[DrinkCreate]:
+        if isinstance(data, Exception):
+            self._fail(line_no, f"Недопустимый формат строки: {data}")
+            return None
+        try:
+            drink = DrinkCreate.model_validate(data)
+        except Exception as e:
+            self._fail(line_no, f"Validation error: {e}")
+            return None
+        if drink.section_id not in self._section_ids:
+            self._fail(line_no, f"Секция {drink.section_id} не найдена")
+            return None
+        return drink
+
+    def _flush(self, batch: List[Tuple[int, DrinkCreate]]):
+        try:
+            self._write_batch(batch)
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            for line_no, _ in batch:
+                self._fail(line_no, f"Ошибка записи пакета: {e}")
+
+    def _write_batch(self, batch: List[Tuple[int, DrinkCreate]]):
+        session = self.session
+
+        # 1. Сводим строки пакета по ключу напитка (в CSV у одного напитка несколько строк)
+        drinks: Dict[Tuple[str, str], DrinkCreate] = {}
+        volumes: Dict[Tuple[str, str], Dict[int, dict]] = {}
+        for _, drink in batch:
+            key = (drink.section_id, drink.name)
+            drinks[key] = drink
+            for volume_price in drink.volume_prices:
+                volumes.setdefault(key, {})[volume_price.volume] = volume_price.model_dump(exclude={"id"})
+
+        # 2. Находим уже существующие напитки одним запросом
+        existing = session.exec(
+            select(Drink.id, Drink.section_id, Drink.name)
+            .where(Drink.name.in_({name for _, name in drinks}))
+            .where(Drink.section_id.in_({section_id for section_id, _ in drinks}))
+        ).all()
+        drink_ids = {(section_id, name): drink_id for drink_id, section_id, name in existing if (section_id, name) in drinks}
+
+        # 3. Новые напитки - одним многострочным INSERT, существующие - пакетным UPDATE по PK
+        new_keys = [key for key in drinks if key not in drink_ids]
+
+        def drink_fields(key):
+            drink = drinks[key]
+            return {
+                "name": drink.name,
+                "ingredients": drink.ingredients,
+                "product_description": drink.product_description,
+                "global_sale": drink.global_sale,
+                "section_id": drink.section_id,
+            }
+
+        new_ids = Drink.create_many(session, [{**drink_fields(key), "img_src": DEFAULT_PRODUCT_IMG} for key in new_keys])
+        drink_ids.update(zip(new_keys, new_ids))
+        updated_keys = [key for key in drinks if key not in new_keys]
+        if updated_keys:
+            session.execute(update(Drink), [{**drink_fields(key), "id": drink_ids[key]} for key in updated_keys])
+
+        # 4. Существующие объемы обновленных напитков - одним запросом
+        volume_ids = {}
+        if updated_keys:
+            rows = session.exec(
+                select(DrinkVolumePrice.id, DrinkVolumePrice.drink_id, DrinkVolumePrice.volume)
+                .where(DrinkVolumePrice.drink_id.in_([drink_ids[key] for key in updated_keys]))
+            ).all()
+            volume_ids = {(drink_id, volume): volume_id for volume_id, drink_id, volume in rows}
+
+        new_volumes, updated_volumes = [], []
+        for key, by_volume in volumes.items():
+            drink_id = drink_ids[key]
+            for volume, values in by_volume.items():
+                row = {**values, "drink_id": drink_id,
+                       **pricing_fields(values["price"], values["sale"], drinks[key].global_sale)}
+                if row.get("img_src") is None:
+                    row.pop("img_src")
+                if (drink_id, volume) in volume_ids:
+                    updated_volumes.append({**row, "id": volume_ids[(drink_id, volume)]})
+                else:
+                    new_volumes.append(row)
+
+        DrinkVolumePrice.create_many(session, [{"img_src": DEFAULT_PRODUCT_IMG, **row} for row in new_volumes])
+        if updated_volumes:
+            session.execute(update(DrinkVolumePrice), updated_volumes)
+
+        # У обновленных напитков могла смениться global_sale - пересчитываем цены и объемов не из файла
+        if updated_keys:
+            refresh_drink_prices(session, [drink_ids[key] for key in updated_keys])
+
+        self.report.created_drinks += len(new_keys)
+        self.report.updated_drinks += len(updated_keys)
+        self.report.created_volumes += len(new_volumes)
+        self.report.updated_volumes += len(updated_volumes)
+        self.touched_drink_ids.update(drink_ids.values())
+
+
+def import_catalog(session: Session, stream: TextIO, fmt: str, batch_size: int = settings.CATALOG_IMPORT_BATCH_SIZE) -> CatalogImportReport:
+    """Импорт каталога из текстового потока CSV/JSONL"""
+    return CatalogImporter(session, batch_size).run(stream, fmt)
+
+
+def import_catalog_file(session: Session, binary: io.RawIOBase, fmt: str, batch_size: int = settings.CATALOG_IMPORT_BATCH_SIZE) -> CatalogImportReport:
+    """Импорт каталога из бинарного файла (например, UploadFile.file) без чтения его целиком в память"""
+    stream = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    try:
+        return import_catalog(session, stream, fmt, batch_size)
+    finally:
+        stream.detach()
+
+
+if __name__ == "__main__":
+    # CLI: python -m core.catalog_import price_list.csv --batch-size 2000
+    from core.database import engine
+
+    parser = argparse.ArgumentParser(description="Импорт каталога напитков из CSV/JSONL")
+    parser.add_argument("path", help="Путь к файлу .csv или .jsonl")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Формат файла (по умолчанию - по расширению)")
+    parser.add_argument("--batch-size", type=int, default=settings.CATALOG_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8-sig", newline="") as file, Session(engine) as db_session:
+        result = import_catalog(db_session, file, args.format or detect_format(args.path), args.batch_size)
+    print(result.model_dump_json(indent=2))
@@ -0,0 +1,47 @@
+from typing import List
+
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session
+
+from models.models import Drink
+from schemas.schemas import DrinkRead
+
+
+def load_drinks(session: Session, stmt) -> List[Drink]:
+    """
+    Загружает напитки вместе со всеми объемами/ценами.
+
+    Вместо ленивой подгрузки drink.volume_prices для каждого напитка (N+1)
+    объемы забираются одним дополнительным запросом с IN (...) по всей странице,
+    поэтому страница любого размера стоит два запроса к БД.
+    """
+    stmt = stmt.options(selectinload(Drink.volume_prices))
+    return list(session.exec(stmt).all())
+
+
+def drink_to_read(drink: Drink) -> DrinkRead:
+    """Преобразование напитка (с уже загруженными объемами) в формат Pydantic"""
+    return DrinkRead(
+        id=drink.id,
+        name=drink.name,
+        ingredients=drink.ingredients,
+        product_description=drink.product_description,
+        global_sale=drink.global_sale,
+        section_id=drink.section_id,
+        img_src=drink.img_src,
+        img_thumb_src=drink.img_thumb_src,
+        img_card_src=drink.img_card_src,
+        volume_prices=[
+            {
+                "id": vp.id,
+                "img_src": vp.img_src,
+                "volume": vp.volume,
+                "price": vp.price,
+                "quantity": vp.quantity,
+                "sale": vp.sale,
+                "img_thumb_src": vp.img_thumb_src,
+                "img_card_src": vp.img_card_src
+            }
+            for vp in drink.volume_prices
+        ]
+    )
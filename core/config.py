@@ -1,9 +1,25 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Literal, Optional
 
 from fastapi_mail import ConnectionConfig
 
 
+# Профили пула соединений с БД
+DB_PROFILES = {
+    # Локальная разработка: небольшой пул, все запросы в лог
+    "dev": dict(pool_size=5, max_overflow=5, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True,
+                echo=True, connect_timeout=10, statement_timeout_ms=0),
+    # Управляемый MySQL закрывает простаивающие соединения - пересоздаем их раньше и проверяем перед выдачей;
+    # запрос не ждет соединение дольше pool_timeout, а зависший SELECT прерывается сервером
+    "prod": dict(pool_size=10, max_overflow=20, pool_timeout=10, pool_recycle=280, pool_pre_ping=True,
+                 echo=False, connect_timeout=5, statement_timeout_ms=10000),
+    # Нагрузочные тесты: фиксированный пул без overflow, без лишних проверок
+    "bench": dict(pool_size=20, max_overflow=0, pool_timeout=30, pool_recycle=3600, pool_pre_ping=False,
+                  echo=False, connect_timeout=5, statement_timeout_ms=0),
+}
+
+
 class Settings(BaseSettings):
     # Указываем путь к базе данных, которая будет храниться в папке проекта
     DATABASE_URL: str # База данных будет храниться в файле drink_shop_db.db
@@ -14,6 +30,33 @@ class Settings(BaseSettings):
     db_username: str
     db_password: str
     db_database: str
+
+    # Пул соединений с БД: профиль задает набор значений, отдельные DB_* переопределяют их (см. DB_PROFILES)
+    DB_PROFILE: Literal["dev", "prod", "bench"] = "prod"
+    DB_POOL_SIZE: Optional[int] = None  # Постоянных соединений в пуле
+    DB_MAX_OVERFLOW: Optional[int] = None  # Дополнительных соединений сверх пула при пиковой нагрузке
+    DB_POOL_TIMEOUT: Optional[float] = None  # Сколько секунд ждать свободное соединение
+    DB_POOL_RECYCLE: Optional[int] = None  # Пересоздавать соединения старше N секунд (меньше wait_timeout сервера)
+    DB_POOL_PRE_PING: Optional[bool] = None  # Проверять соединение перед выдачей из пула
+    DB_ECHO: Optional[bool] = None  # Логировать все SQL-запросы
+    DB_CONNECT_TIMEOUT: Optional[int] = None  # Таймаут установки соединения, с
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None  # max_execution_time для SELECT в MySQL (0 - без ограничения)
+    # pool_size и max_overflow - общий бюджет соединений процесса: синхронный и асинхронный движки делят его,
+    # асинхронному достается эта доля (см. core/database.py)
+    DB_ASYNC_POOL_SHARE: float = 0.5
+
+    # Реплики для чтения (см. core/replicas.py)
+    DATABASE_REPLICA_URLS: str = ""  # URL реплик через запятую (пусто - все запросы в основную БД)
+    DB_REPLICA_STICKY_SECONDS: int = 5  # Сколько после записи пользователь читает из основной БД
+    DB_REPLICA_CHECK_SECONDS: int = 10  # Период проверки реплик
+    DB_REPLICA_MAX_LAG_SECONDS: Optional[int] = None  # Реплика с большим отставанием исключается (None - не проверять)
+
+    # Учет SQL-запросов по HTTP-запросам (см. core/query_stats.py)
+    QUERY_STATS_ENABLED: bool = True  # Заголовок Server-Timing и сводка /metrics/db
+    QUERY_N_PLUS_ONE_THRESHOLD: int = 5  # Сколько одинаковых запросов за HTTP-запрос считать вероятным N+1
+    # Текст повторяющихся запросов в Server-Timing и /metrics/db (None - везде, кроме профиля prod)
+    QUERY_STATS_STATEMENTS: Optional[bool] = None
+
     ALGORITHM: str = "HS256"  # Алгоритм шифрования JWT
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
@@ -27,11 +70,29 @@ class Settings(BaseSettings):
     YC_SECRET_ACCESS_KEY: str
     YC_BUCKET_NAME: str
     YC_ENDPOINT_URL: str
+    S3_UPLOAD_WORKERS: int = 4  # Потоков для загрузки файлов в хранилище
+    S3_MULTIPART_THRESHOLD_MB: int = 8  # С какого размера файл загружается по частям
+    S3_MULTIPART_CHUNK_MB: int = 8  # Размер части multipart-загрузки
+    S3_MULTIPART_CONCURRENCY: int = 4  # Параллельных частей на одну загрузку
+    S3_DELETE_BATCH_SIZE: int = 1000  # Ключей в одном запросе DeleteObjects (максимум S3 - 1000)
+    S3_DELETE_POLL_SECONDS: int = 10  # Как часто воркер проверяет очередь удаления
+    S3_DELETE_LEASE_SECONDS: int = 300  # На сколько пачка закрепляется за процессом на время запросов к хранилищу
+    S3_DELETE_RETRY_BASE_SECONDS: int = 30  # Первая задержка повтора, дальше удваивается
+    S3_DELETE_RETRY_MAX_SECONDS: int = 6 * 3600
+    IMAGE_THUMB_SIZE: int = 200  # Сторона WebP-миниатюры, px
+    IMAGE_CARD_SIZE: int = 600  # Сторона WebP-изображения для карточки, px
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_GC_GRACE_SECONDS: int = 3600  # Неиспользуемые изображения моложе этого не удаляются
+    IMAGE_UPLOAD_MAX_MB: int = 10  # Максимальный размер изображения при прямой загрузке
+    IMAGE_UPLOAD_EXPIRES_SECONDS: int = 600  # Срок действия подписи для прямой загрузки
 
     # Настройки Yandex Translate API
     YC_TRANSLATE_API_KEY: str
     YC_FOLDER_ID: str
     YC_TRANSLATE_API_URL: str = "https://translate.api.cloud.yandex.net/translate/v2/translate"
+    TRANSLATE_TIMEOUT_SECONDS: float = 3  # Дольше ждать перевод не будем - ID секции строится транслитерацией
+    TRANSLATE_CACHE_PATH: Optional[str] = str(Path(__file__).parent.parent / ".translate_cache.json")  # None - только в памяти
+    SECTION_ID_TRANSLATE: bool = True  # False - ID секций только транслитерацией, без обращения к API
 
     # Настройки Яндекс SMTP
     YANDEX_EMAIL: str
@@ -41,7 +102,39 @@ class Settings(BaseSettings):
 
     FRONTEND_BASE_URL: str = "https://zero-percent.vercel.app/"
 
+    # Настройки кэша каталога
+    CATALOG_CACHE_MAX_ENTRIES: int = 1000  # Максимум закэшированных ответов (страниц секций, напитков)
+    CATALOG_CACHE_TTL_SECONDS: int = 60  # Страховочное время жизни записи
+    CATALOG_HTTP_MAX_AGE: int = 0  # max-age для браузера (0 - всегда перепроверять по ETag)
+    RANDOM_DRINKS_PER_SECTION: Optional[int] = None  # Квота напитков из одной секции в /drinks/random/
+    SEARCH_INDEX_REBUILD_SECONDS: int = 600  # Период полной перестройки поискового индекса (изменения - раз в TTL кэша)
+    SEARCH_MAX_SCORED_DOCS: int = 300  # Сколько документов оценивать на запрос, дальше - лучшие из найденных (0 - без ограничения)
+    CATALOG_IMPORT_BATCH_SIZE: int = 1000  # Размер пакета при импорте каталога
+    CATALOG_BULK_UPDATE_MAX_ITEMS: int = 10000  # Максимум строк в одном пакетном обновлении объемов
+    CATALOG_EXPORT_BATCH_SIZE: int = 1000  # Напитков в одном пакете NDJSON-выгрузки
+    ID_BLOCK_SIZE: int = 1000  # Сколько ID процесс резервирует за одно обращение к таблице idsequence
+
+    def db_engine_options(self) -> dict:
+        """Параметры пула для текущего профиля с учетом явно заданных DB_*"""
+        options = dict(DB_PROFILES[self.DB_PROFILE])
+        overrides = {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "echo": self.DB_ECHO,
+            "connect_timeout": self.DB_CONNECT_TIMEOUT,
+            "statement_timeout_ms": self.DB_STATEMENT_TIMEOUT_MS,
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return options
 
+    def query_stats_statements(self) -> bool:
+        """Показывать ли текст SQL-запросов в ответах: в prod он доступен любой странице через CORS"""
+        if self.QUERY_STATS_STATEMENTS is not None:
+            return self.QUERY_STATS_STATEMENTS
+        return self.DB_PROFILE != "prod"
 
     class Config:
         env_file = Path(__file__).parent.parent / ".env"
@@ -1,6 +1,17 @@
+import argparse
+import asyncio
 import os
+import ssl
+import threading
+import time
+from collections import deque
 
+from sqlalchemy import event, exc, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pathlib import Path
 
 from core.config import settings
@@ -17,18 +28,332 @@ if LOCAL_SSL_PATH and Path(LOCAL_SSL_PATH).exists():
 elif RENDER_SSL_PATH:
     DB_SSL_CA_PATH = RENDER_SSL_PATH
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={
-        "ssl_ca": settings.DB_SSL_CA_PATH  # путь к ssl сертификату
-    },
-    echo=True
-)
+
+class PoolStats:
+    """Статистика выдачи соединений из пула: сколько раз и как долго запросы ждали соединение"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            if not ok:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._waits.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else None,
+            "wait_p95_ms": round(waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000, 2) if waits else None,
+            "wait_max_ms": round(self.max_wait * 1000, 2) if self.checkouts else None,
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, который замеряет ожидание свободного соединения (включая открытие нового)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # engine.dispose() пересоздает пул - статистику сохраняем
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - started, ok=True)
+        return connection
+
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """То же для асинхронного движка (очередь, совместимая с asyncio)"""
+
+
+def engine_options(kind: str = "full", **overrides) -> dict:
+    """
+    Параметры пула по профилю DB_PROFILE с учетом общего бюджета соединений.
+
+    Основная БД доступна через два движка (синхронный и асинхронный) с отдельными пулами.
+    Чтобы процесс не открывал вдвое больше соединений, чем задано профилем, pool_size и max_overflow
+    делятся между ними: kind="async" получает долю DB_ASYNC_POOL_SHARE, kind="sync" - остаток,
+    kind="full" (реплики, бенчмарки) - весь бюджет. Каждому пулу остается хотя бы одно постоянное соединение.
+    """
+    options = settings.db_engine_options()
+    if kind != "full":
+        for key, minimum in (("pool_size", 1), ("max_overflow", 0)):
+            async_part = max(minimum, int(options[key] * settings.DB_ASYNC_POOL_SHARE))
+            options[key] = async_part if kind == "async" else max(minimum, options[key] - async_part)
+    options.update(overrides)
+    return options
+
+
+def build_engine(url: str = settings.DATABASE_URL, kind: str = "full", **overrides) -> Engine:
+    """Создает движок по профилю DB_PROFILE (dev/prod/bench) из настроек"""
+    options = engine_options(kind, **overrides)
+    connect_timeout = options.pop("connect_timeout")
+    statement_timeout_ms = options.pop("statement_timeout_ms")
+    is_mysql = make_url(url).get_backend_name() == "mysql"
+    connect_args = {}
+    if is_mysql:
+        connect_args = {
+            "ssl_ca": settings.DB_SSL_CA_PATH,  # путь к ssl сертификату
+            "connection_timeout": connect_timeout,  # mysql-connector
+        }
+
+    engine = create_engine(url, connect_args=connect_args, poolclass=TimedQueuePool, **options)
+
+    if statement_timeout_ms and is_mysql:
+        @event.listens_for(engine, "connect")
+        def set_statement_timeout(dbapi_connection, connection_record):
+            # Сервер прерывает SELECT дольше лимита вместо того, чтобы держать соединение пула
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {int(statement_timeout_ms)}")
+            cursor.close()
+
+    return engine
+
+
+def async_database_url(url: str) -> str:
+    """URL синхронного драйвера -> асинхронный (mysql+mysqlconnector -> mysql+aiomysql)"""
+    url = make_url(url)
+    drivers = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+    return url.set(drivername=drivers.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+
+def build_async_engine(url: str = settings.DATABASE_URL, kind: str = "async", **overrides) -> AsyncEngine:
+    """Асинхронный движок (aiomysql); по умолчанию пул - доля общего бюджета (см. engine_options)"""
+    url = async_database_url(url)
+    options = engine_options(kind, **overrides)
+    connect_timeout = options.pop("connect_timeout")
+    statement_timeout_ms = options.pop("statement_timeout_ms")
+
+    connect_args = {}
+    if make_url(url).get_backend_name() == "mysql":
+        connect_args["connect_timeout"] = connect_timeout
+        if settings.DB_SSL_CA_PATH:
+            connect_args["ssl"] = ssl.create_default_context(cafile=settings.DB_SSL_CA_PATH)
+        if statement_timeout_ms:
+            # Выполняется при открытии каждого соединения, как set_statement_timeout в build_engine
+            connect_args["init_command"] = f"SET SESSION max_execution_time = {int(statement_timeout_ms)}"
+
+    return create_async_engine(url, connect_args=connect_args, poolclass=TimedAsyncAdaptedQueuePool, **options)
+
+
+def pool_status(pool: Pool) -> dict:
+    """Текущее состояние пула и статистика ожидания"""
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
+
+
+# Пулы основной БД делят один бюджет соединений на процесс (воркер gunicorn)
+engine = build_engine(kind="sync")
+async_engine = build_async_engine(kind="async")
 
 def get_session():
     with Session(engine) as session:
         yield session
 
+async def get_async_session():
+    """
+    Сессия для async-эндпоинтов: запросы не блокируют цикл событий.
+    expire_on_commit=False - после commit атрибуты объектов доступны без повторной загрузки
+    (неявный запрос из async-кода невозможен)
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
 def create_tables():
     """Создание таблиц при старте приложения"""
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+
+
+async def _benchmark(database_url: str, levels, requests: int, delay: float):
+    """Сравнение синхронной сессии внутри async def, пула потоков и AsyncSession при росте конкурентности"""
+    from starlette.concurrency import run_in_threadpool
+
+    sync_engine = build_engine(database_url, pool_size=max(levels), max_overflow=0)
+    aio_engine = build_async_engine(database_url, pool_size=max(levels), max_overflow=0)
+
+    if make_url(database_url).get_backend_name() == "mysql":
+        query = text("SELECT SLEEP(:delay)")
+    else:
+        # Для локального запуска на SQLite: sleep() выполняется в потоке соединения
+        query = text("SELECT sleep(:delay)")
+        for target in (sync_engine, aio_engine.sync_engine):
+            event.listen(target, "connect", lambda conn, _: conn.create_function("sleep", 1, time.sleep))
+
+    def sync_query():
+        with sync_engine.connect() as conn:
+            conn.execute(query, {"delay": delay})
+
+    async def blocking():
+        # Как сейчас в async-эндпоинтах с Depends(get_session): запрос блокирует цикл событий
+        sync_query()
+
+    async def threadpool():
+        # Как в def-эндпоинтах: запрос в пуле потоков Starlette
+        await run_in_threadpool(sync_query)
+
+    async def native():
+        async with aio_engine.connect() as conn:
+            await conn.execute(query, {"delay": delay})
+
+    _print_header()
+    for name, handler in (("sync", blocking), ("threadpool", threadpool), ("async", native)):
+        for level in levels:
+            await _measure(name, handler, level, requests)
+
+    sync_engine.dispose()
+    await aio_engine.dispose()
+
+
+def _print_header():
+    print(f"{'режим':<12}{'конкурентность':>16}{'запросов/с':>14}{'p95, мс':>10}{'ошибок':>8}")
+
+
+async def _measure(name: str, handler, level: int, requests: int):
+    """Выполняет requests вызовов handler, не больше level одновременно; печатает пропускную способность и p95"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(level)
+
+    async def timed():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await handler()
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else float("nan")
+    print(f"{name:<12}{level:>16}{requests / elapsed:>14,.0f}{p95:>10.1f}{errors:>8}")
+
+
+async def _benchmark_endpoints(base_url: str, levels, requests: int):
+    """
+    Нагрузка на запущенный сервер через настоящие эндпоинты корзины и заказа.
+    Покупатели, каталог и пункт самовывоза создаются в БД из DATABASE_URL - сервер должен работать с ней же.
+    Для сравнения с синхронной версией эндпоинтов запустите тот же бенчмарк против сервера
+    из предыдущей ревизии на той же БД (тот же профиль DB_PROFILE и число воркеров).
+    """
+    import uuid
+    from datetime import date
+
+    import httpx
+
+    import models.cart_models  # Связанные модели (OrderItem) нужны мапперу до первого запроса
+    from core.pricing import pricing_fields
+    from core.tokens import create_tokens
+    from id_generator import id_allocator
+    from models.auth_models import StoreAddress, User, UserSession
+    from models.models import Drink, DrinkVolumePrice, Section
+
+    run = uuid.uuid4().hex[:8]
+    # Как при старте приложения: блоки ID резервируются до транзакции с данными
+    id_allocator.prefill(engine, [model.__table__ for model in (Drink, DrinkVolumePrice, StoreAddress, User, UserSession)])
+    clients: asyncio.Queue = asyncio.Queue()
+    with Session(engine) as session:
+        section = Section(id=f"bench-{run}", title=f"Бенчмарк {run}", img_src="-")
+        session.add(section)
+        drink = Drink.create(session, name=f"Бенчмарк {run}", ingredients="-", product_description="-",
+                             section_id=section.id)
+        volume = DrinkVolumePrice.create(session, drink_id=drink.id, volume=500, price=100, quantity=10 ** 6,
+                                         sale=None, **pricing_fields(100, None, None))
+        store = StoreAddress.create(session, full_address=f"Бенчмарк {run}", street="-", house="-")
+        # У каждого одновременного запроса свой покупатель: у покупателя одна корзина
+        for index in range(max(levels)):
+            user = User.create(session, email=f"bench-{run}-{index}@example.com", hashed_password="-",
+                               first_name="Бенчмарк", last_name=str(index), birth_date=date(2000, 1, 1),
+                               phone=f"+7{index:010d}")
+            access_token, refresh_token, _ = create_tokens(user)
+            UserSession.create(session, user_id=user.id, refresh_token=refresh_token)
+            clients.put_nowait(httpx.AsyncClient(
+                base_url=base_url, timeout=30,
+                headers={"Cookie": f"access_token={access_token}; refresh_token={refresh_token}"}
+            ))
+        session.commit()
+        volume_id, store_id = volume.id, store.id
+
+    async def as_customer(action):
+        client = await clients.get()
+        try:
+            await action(client)
+        finally:
+            clients.put_nowait(client)
+
+    async def add_item(client):
+        response = await client.post("/cart/items/", json={"drink_volume_price_id": volume_id, "quantity": 1})
+        response.raise_for_status()
+
+    async def get_cart(client):
+        (await client.get("/cart/")).raise_for_status()
+
+    async def place_order(client):
+        await add_item(client)
+        response = await client.post("/orders/", json={
+            "delivery_type": "pickup", "delivery_price": 0, "store_address_id": store_id
+        })
+        response.raise_for_status()
+
+    _print_header()
+    for name, action in (("cart add", add_item), ("cart get", get_cart), ("order", place_order)):
+        for level in levels:
+            await _measure(name, lambda: as_customer(action), level, requests)
+
+    while not clients.empty():
+        await clients.get_nowait().aclose()
+
+
+if __name__ == "__main__":
+    # Бенчмарк драйверов: python -m core.database --concurrency 1 10 50 100 --requests 1000 --delay 0.02
+    # Каждый запрос держит соединение delay секунд (SELECT SLEEP), как медленный запрос в БД
+    # Бенчмарк эндпоинтов корзины и заказа: python -m core.database --base-url http://127.0.0.1:8000
+    parser = argparse.ArgumentParser(description="Масштабирование синхронного и асинхронного доступа к БД")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--base-url", help="Адрес запущенного сервера: нагрузка на эндпоинты вместо SELECT SLEEP")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--delay", type=float, default=0.02, help="Длительность одного запроса, с")
+    args = parser.parse_args()
+
+    if args.base_url:
+        asyncio.run(_benchmark_endpoints(args.base_url, args.concurrency, args.requests))
+    else:
+        asyncio.run(_benchmark(args.database_url, args.concurrency, args.requests, args.delay))
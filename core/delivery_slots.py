@@ -1,5 +1,6 @@
 from datetime import date, time, timedelta, datetime
 from sqlmodel import Session, delete
+from id_generator import generate_unique_ids
 from models.cart_models import DeliveryTimeSlot, DeliveryTimeSlotStatus
 
 
@@ -23,8 +24,10 @@ def ensure_slots_for_date(db: Session, for_date: date) -> list[DeliveryTimeSlot]
 
     # Создаём новые слоты
     slots = []
-    for time_slot in _generate_time_intervals():
+    intervals = _generate_time_intervals()
+    for slot_id, time_slot in zip(generate_unique_ids(db, DeliveryTimeSlot, len(intervals)), intervals):
         slot = DeliveryTimeSlot(
+            id=slot_id,
             date=for_date,
             time_slot=time_slot,
             max_orders=5,
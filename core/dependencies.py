@@ -3,18 +3,19 @@ from typing import Optional
 from fastapi import Depends, HTTPException, Request, Response
 import jwt
 from core.config import settings
-from core.database import get_session
-from sqlmodel import Session, select
+from core.database import get_async_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from core.tokens import get_token_from_cookie, set_jwt_cookie, create_tokens
 from models.auth_models import User, UserSession
 from datetime import datetime, timedelta, UTC
 
 # Проверка токена и возврат текущего пользователя (работает через куки)
-def get_current_user(
+async def get_current_user(
         request: Request,
         response: Response,
-        session: Session = Depends(get_session)
+        session: AsyncSession = Depends(get_async_session)
 ) -> User:
     try:
         # 1. Получение access token
@@ -27,23 +28,23 @@ def get_current_user(
                 email = payload.get("sub")
 
                 if email:
-                    user = session.exec(select(User).where(User.email == email)).first()
+                    user = (await session.exec(select(User).where(User.email == email))).first()
                     if user and user.is_active:
                         # 3. Проверка refresh token
                         refresh_token = request.cookies.get("refresh_token")
                         if refresh_token:
-                            user_session = session.exec(
+                            user_session = (await session.exec(
                                 select(UserSession)
                                 .where(UserSession.refresh_token == refresh_token)
                                 .where(UserSession.user_id == user.id)
-                            ).first()
+                            )).first()
 
                             # Явно приводим даты к UTC перед сравнением
                             if user_session and user_session.expires_at.replace(tzinfo=UTC) > datetime.now(UTC):
                                 user_session.expires_at = datetime.now(UTC) + timedelta(
                                     days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
                                 session.add(user_session)
-                                session.commit()
+                                await session.commit()
                                 return user
 
                         raise HTTPException(status_code=401, detail="Требуется авторизация")
@@ -59,17 +60,17 @@ def get_current_user(
             raise HTTPException(status_code=401, detail="Требуется авторизация")
 
         # 5. Проверка refresh token в базе
-        user_session = session.exec(
+        user_session = (await session.exec(
             select(UserSession)
             .where(UserSession.refresh_token == refresh_token)
             .where(UserSession.expires_at.replace(tzinfo=UTC) > datetime.now(UTC))
-        ).first()
+        )).first()
 
         if not user_session:
             raise HTTPException(status_code=401, detail="Сессия истекла")
 
         # 6. Получение пользователя
-        user = session.get(User, user_session.user_id)
+        user = await session.get(User, user_session.user_id)
         if not user or not user.is_active:
             raise HTTPException(status_code=401, detail="Пользователь не найден")
 
@@ -80,24 +81,26 @@ def get_current_user(
         user_session.refresh_token = new_refresh_token
         user_session.expires_at = datetime.now(UTC) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
         session.add(user_session)
-        session.commit()
+        await session.commit()
 
         # 9. Установление куки
         set_jwt_cookie(response, new_access_token, new_refresh_token)
 
         return user
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка сервера: {str(e)}")
 
 async def get_user_or_none(
     request: Request,
     response: Response,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ) -> Optional[User]:
     """Возвращает пользователя или None если не авторизован"""
     try:
-        return get_current_user(request, response, session)
+        return await get_current_user(request, response, session)
     except HTTPException:
         return None
 
@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+from models.models import Drink, Section
+
+
+class DrinkSampler:
+    """
+    Пул ID напитков для случайной выборки (замена ORDER BY RAND()).
+
+    Держит в памяти массив ID всех напитков, привязанных к секции, и перестраивает его,
+    когда меняется версия каталога (или истекает TTL кэша каталога).
+    Выборка limit ID выполняется за O(limit) без обращения к БД.
+    """
+
+    def __init__(self):
+        self._version = -1
+        self._expires_at = 0.0
+        self._ids: List[int] = []
+        self._ids_by_section: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self, session: Session):
+        """Перестраивает пул, если каталог изменился с момента последней загрузки"""
+        with self._lock:
+            if self._version == catalog_cache.version and self._expires_at > time.monotonic():
+                return
+
+            version = catalog_cache.version
+            rows = session.exec(select(Drink.id, Drink.section_id).join(Section)).all()
+
+            ids_by_section: Dict[str, List[int]] = {}
+            for drink_id, section_id in rows:
+                ids_by_section.setdefault(section_id, []).append(drink_id)
+
+            self._ids = [drink_id for drink_id, _ in rows]
+            self._ids_by_section = ids_by_section
+            self._version = version
+            self._expires_at = time.monotonic() + settings.CATALOG_CACHE_TTL_SECONDS
+
+    def sample(self, session: Session, limit: int, per_section: Optional[int] = None) -> List[int]:
+        """
+        Возвращает до limit случайных ID напитков.
+        per_section ограничивает количество напитков из одной секции.
+        """
+        self._ensure_fresh(session)
+
+        if per_section is None:
+            population = self._ids
+        else:
+            # Сначала выбираем не более per_section напитков из каждой секции
+            population = []
+            for section_ids in self._ids_by_section.values():
+                population.extend(random.sample(section_ids, min(per_section, len(section_ids))))
+
+        return random.sample(population, min(limit, len(population)))
+
+
+# Общий пул для процесса
+drink_sampler = DrinkSampler()
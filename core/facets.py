@@ -0,0 +1,161 @@
+import bisect
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+from models.models import Drink, DrinkVolumePrice
+
+
+@dataclass
+class SectionFacetData:
+    """
+    Предрасчитанные фасеты одной секции.
+    Каждый вариант (объем/цена) имеет порядковый номер i, фасеты - битовые маски по вариантам.
+    """
+    drink_ids: List[int] = field(default_factory=list)  # ID напитка для варианта i
+    prices: List[int] = field(default_factory=list)  # Итоговая цена варианта i
+    volume_bits: Dict[int, int] = field(default_factory=dict)  # объем -> маска вариантов
+    on_sale_bits: int = 0
+    in_stock_bits: int = 0
+    price_order: List[int] = field(default_factory=list)  # Номера вариантов по возрастанию цены
+    sorted_prices: List[int] = field(default_factory=list)  # Цены в том же порядке (для bisect)
+
+    @property
+    def all_bits(self) -> int:
+        return (1 << len(self.drink_ids)) - 1
+
+    def price_bits(self, price_min: Optional[int], price_max: Optional[int]) -> int:
+        """Маска вариантов с итоговой ценой в диапазоне [price_min, price_max]"""
+        if price_min is None and price_max is None:
+            return self.all_bits
+        lo = 0 if price_min is None else bisect.bisect_left(self.sorted_prices, price_min)
+        hi = len(self.sorted_prices) if price_max is None else bisect.bisect_right(self.sorted_prices, price_max)
+        bits = 0
+        for variant in self.price_order[lo:hi]:
+            bits |= 1 << variant
+        return bits
+
+    def drinks_in(self, bits: int) -> set:
+        """Множество напитков, у которых есть хотя бы один вариант из маски"""
+        drinks = set()
+        while bits:
+            low = bits & -bits
+            drinks.add(self.drink_ids[low.bit_length() - 1])
+            bits ^= low
+        return drinks
+
+    def price_range(self, bits: int):
+        prices = [self.prices[variant] for variant in range(len(self.prices)) if bits >> variant & 1]
+        return (min(prices), max(prices)) if prices else (None, None)
+
+
+class FacetIndex:
+    """
+    Фасетный индекс каталога: цена, объем, скидка и наличие по каждой секции.
+    Строится одним запросом и перестраивается при изменении версии каталога.
+    """
+
+    def __init__(self):
+        self._version = -1
+        self._expires_at = 0.0
+        self._sections: Dict[str, SectionFacetData] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self, session: Session):
+        if self._version == catalog_cache.version and self._expires_at > time.monotonic():
+            return
+
+        version = catalog_cache.version
+        rows = session.exec(
+            select(
+                Drink.section_id, DrinkVolumePrice.drink_id, DrinkVolumePrice.volume,
+                DrinkVolumePrice.price_final, DrinkVolumePrice.effective_sale, DrinkVolumePrice.quantity
+            )
+            .join(Drink, DrinkVolumePrice.drink_id == Drink.id)
+            .order_by(Drink.section_id, DrinkVolumePrice.drink_id, DrinkVolumePrice.id)
+        ).all()
+
+        sections: Dict[str, SectionFacetData] = {}
+        for section_id, drink_id, volume, price_final, sale_percent, quantity in rows:
+            data = sections.setdefault(section_id, SectionFacetData())
+            variant = len(data.drink_ids)
+            bit = 1 << variant
+
+            data.drink_ids.append(drink_id)
+            data.prices.append(price_final)
+            data.volume_bits[volume] = data.volume_bits.get(volume, 0) | bit
+            if sale_percent:
+                data.on_sale_bits |= bit
+            if quantity > 0:
+                data.in_stock_bits |= bit
+
+        for data in sections.values():
+            data.price_order = sorted(range(len(data.prices)), key=data.prices.__getitem__)
+            data.sorted_prices = [data.prices[variant] for variant in data.price_order]
+
+        self._sections = sections
+        self._version = version
+        self._expires_at = time.monotonic() + settings.CATALOG_CACHE_TTL_SECONDS
+
+    def filter(
+            self,
+            session: Session,
+            section_id: str,
+            price_min: Optional[int] = None,
+            price_max: Optional[int] = None,
+            volumes: Optional[List[int]] = None,
+            on_sale: bool = False,
+            in_stock: bool = False
+    ) -> tuple[List[int], dict]:
+        """
+        Применяет фильтры к секции.
+        Возвращает ID подходящих напитков (по возрастанию) и счетчики фасетов:
+        счетчик каждого фасета учитывает все остальные выбранные фильтры.
+        """
+        with self._lock:
+            self._ensure_fresh(session)
+            data = self._sections.get(section_id)
+
+        if data is None:
+            return [], {"volumes": [], "on_sale": 0, "in_stock": 0, "price_min": None, "price_max": None}
+
+        # Маски отдельных фильтров (неактивный фильтр пропускает все варианты)
+        masks = {
+            "price": data.price_bits(price_min, price_max),
+            "volume": data.all_bits,
+            "on_sale": data.on_sale_bits if on_sale else data.all_bits,
+            "in_stock": data.in_stock_bits if in_stock else data.all_bits,
+        }
+        if volumes:
+            masks["volume"] = 0
+            for volume in volumes:
+                masks["volume"] |= data.volume_bits.get(volume, 0)
+
+        def combined(exclude: Optional[str] = None) -> int:
+            bits = data.all_bits
+            for name, mask in masks.items():
+                if name != exclude:
+                    bits &= mask
+            return bits
+
+        price_range = data.price_range(combined("price"))
+        facets = {
+            "volumes": [
+                {"value": volume, "count": len(data.drinks_in(combined("volume") & bits))}
+                for volume, bits in sorted(data.volume_bits.items())
+            ],
+            "on_sale": len(data.drinks_in(combined("on_sale") & data.on_sale_bits)),
+            "in_stock": len(data.drinks_in(combined("in_stock") & data.in_stock_bits)),
+            "price_min": price_range[0],
+            "price_max": price_range[1],
+        }
+        return sorted(data.drinks_in(combined())), facets
+
+
+# Общий фасетный индекс для процесса
+facet_index = FacetIndex()
@@ -0,0 +1,61 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+from pydantic_core import to_json
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+
+
+@dataclass
+class CachedResponse:
+    """Готовый к отправке JSON-ответ: тело сериализуется один раз при заполнении кэша"""
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, value: Any, headers: Optional[Dict[str, str]] = None) -> "CachedResponse":
+        body = to_json(value)
+        # Сильный ETag по содержимому: одинаковый ответ дает одинаковый ETag во всех воркерах
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        return cls(body=body, etag=etag, headers=headers or {})
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Проверка заголовка If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def catalog_response(request: Request, key: Hashable, loader: Callable[[], Any]) -> Response:
+    """
+    Отдает ответ каталога из кэша с ETag и Cache-Control.
+    Если клиент прислал актуальный ETag - возвращает 304 без тела.
+    loader может вернуть как само значение, так и CachedResponse с дополнительными заголовками.
+    """
+    def load() -> CachedResponse:
+        value = loader()
+        return value if isinstance(value, CachedResponse) else CachedResponse.build(value)
+
+    cached = catalog_cache.get_or_load(key, load)
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={settings.CATALOG_HTTP_MAX_AGE}, must-revalidate",
+    }
+
+    if _etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=cached.body,
+        media_type="application/json",
+        headers={**cached.headers, **headers}
+    )
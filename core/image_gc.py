@@ -0,0 +1,79 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.database import engine
+from core.s3 import s3_service
+from models.models import Drink, DrinkVolumePrice, Section
+
+# Поля с изображениями товаров (оригинал и WebP-варианты)
+IMAGE_FIELDS = ("img_src", "img_thumb_src", "img_card_src")
+
+# Модели и колонки, которые ссылаются на файлы в хранилище
+IMAGE_COLUMNS = (
+    (Drink, IMAGE_FIELDS),
+    (DrinkVolumePrice, IMAGE_FIELDS),
+    (Section, ("img_src",)),
+)
+
+
+def referenced_urls(session: Session, urls: Set[str]) -> Set[str]:
+    """Какие из URL еще используются напитками, объемами или секциями"""
+    if not urls:
+        return set()
+    used = set()
+    for model, fields in IMAGE_COLUMNS:
+        columns = [getattr(model, field) for field in fields]
+        rows = session.exec(select(*columns).where(or_(*(column.in_(urls) for column in columns)))).all()
+        for row in rows:
+            used.update(value for value in row if value in urls)
+    return used
+
+
+def is_stale(last_modified: Optional[datetime]) -> bool:
+    """Объект старше периода ожидания (свежие могли только что переиспользовать - см. S3Service.touch)"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.IMAGE_GC_GRACE_SECONDS)
+    return last_modified is not None and last_modified < cutoff
+
+
+def sweep(prefix: str = "products/", batch_size: int = 1000) -> List[str]:
+    """
+    Полный обход папки товаров: удаляет все объекты старше IMAGE_GC_GRACE_SECONDS,
+    на которые нет ссылок в БД (например, после неудачной транзакции).
+    Обычные удаления идут через очередь (core/s3_outbox.py), обход нужен только для "потерянных" файлов.
+    """
+    deleted = []
+
+    def flush(batch):
+        with Session(engine) as session:
+            used = referenced_urls(session, set(batch))
+        keys = [s3_service.key_from_url(url) for url in batch if url not in used]
+        if keys:
+            failed = s3_service.delete_keys(keys)
+            deleted.extend(key for key in keys if key not in failed)
+
+    batch = []
+    for key, last_modified in s3_service.iter_objects(prefix):
+        if "default.webp" in key or not is_stale(last_modified):
+            continue
+        batch.append(s3_service.public_url(key))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return deleted
+
+
+if __name__ == "__main__":
+    # CLI: python -m core.image_gc --prefix products/
+    parser = argparse.ArgumentParser(description="Удаление изображений товаров, на которые нет ссылок")
+    parser.add_argument("--prefix", default="products/")
+    args = parser.parse_args()
+
+    removed = sweep(args.prefix)
+    print(f"Удалено объектов: {len(removed)}")
@@ -0,0 +1,97 @@
+import hashlib
+import io
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.config import settings
+from core.s3 import s3_service
+
+# Ключи изображений товаров строятся по хэшу содержимого и никогда не перезаписываются,
+# поэтому CDN и браузеры могут кэшировать их бессрочно
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Производные изображения: имя -> сторона квадрата в пикселях
+IMAGE_VARIANTS = {
+    "thumb": settings.IMAGE_THUMB_SIZE,  # Миниатюры в корзине и поиске
+    "card": settings.IMAGE_CARD_SIZE,  # Карточки в сетке каталога
+}
+
+
+def build_srcset(thumb_src: Optional[str], card_src: Optional[str]) -> Optional[str]:
+    """Атрибут srcset для <img>: ширина каждого варианта в пикселях"""
+    parts = [
+        f"{src} {IMAGE_VARIANTS[name]}w"
+        for name, src in (("thumb", thumb_src), ("card", card_src))
+        if src
+    ]
+    return ", ".join(parts) or None
+
+
+def make_variants(fileobj: BinaryIO) -> Dict[str, bytes]:
+    """
+    Генерирует WebP-варианты фиксированного размера.
+    Изображение вписывается в квадрат целиком (без обрезки), поля прозрачные.
+    Если файл не удается открыть как растровое изображение - вариантов нет.
+    """
+    try:
+        with Image.open(fileobj) as image:
+            image = ImageOps.exif_transpose(image).convert("RGBA")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return {}
+
+    variants = {}
+    for name, size in IMAGE_VARIANTS.items():
+        resized = ImageOps.pad(image, (size, size), method=Image.Resampling.LANCZOS, color=(0, 0, 0, 0))
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=settings.IMAGE_WEBP_QUALITY, method=4)
+        variants[name] = buffer.getvalue()
+    return variants
+
+
+def content_hash(fileobj: BinaryIO) -> str:
+    """SHA-256 содержимого (читается кусками), файл возвращается в начало"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()[:32]
+
+
+def upload_image(file: UploadFile, folder: str) -> Dict[str, Optional[str]]:
+    """
+    Загружает оригинал и его WebP-варианты по ключам из хэша содержимого (блокирующая функция).
+    Возвращает значения полей img_src, img_thumb_src, img_card_src.
+
+    Одинаковые файлы не загружаются повторно: если оригинал уже есть в хранилище,
+    переиспользуются он и его варианты. Оригинал загружается последним, поэтому
+    его наличие означает, что варианты тоже загружены.
+    """
+    digest = content_hash(file.file)
+    original_key = f"{folder}/{digest}{Path(file.filename or '').suffix.lower()}"
+    variant_names = {name: f"{digest}_{size}.webp" for name, size in IMAGE_VARIANTS.items()}
+
+    if s3_service.touch(original_key):
+        urls = {
+            name: s3_service.public_url(f"{folder}/{filename}")
+            for name, filename in variant_names.items()
+            if s3_service.touch(f"{folder}/{filename}")
+        }
+        img_src = s3_service.public_url(original_key)
+    else:
+        urls = {
+            name: s3_service.upload_bytes(content, folder, variant_names[name], "image/webp", IMMUTABLE_CACHE_CONTROL)
+            for name, content in make_variants(file.file).items()
+        }
+        file.file.seek(0)
+        img_src = s3_service.upload_file(file, folder, original_key.rsplit("/", 1)[-1], IMMUTABLE_CACHE_CONTROL)
+
+    return {"img_src": img_src, "img_thumb_src": urls.get("thumb"), "img_card_src": urls.get("card")}
+
+
+async def upload_image_async(file: UploadFile, folder: str) -> Dict[str, Optional[str]]:
+    """Загрузка оригинала и генерация вариантов в пуле потоков S3, не блокируя event loop"""
+    return await s3_service.run_in_pool(upload_image, file, folder)
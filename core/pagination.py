@@ -0,0 +1,23 @@
+import base64
+import json
+from typing import Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(section_id: str, drink_id: int) -> str:
+    """Кодирует позицию (section_id, id) последнего напитка в непрозрачный токен"""
+    raw = json.dumps([section_id, drink_id], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Декодирует токен обратно в (section_id, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        section_id, drink_id = json.loads(base64.urlsafe_b64decode(padded).decode("utf-8"))
+        if not isinstance(section_id, str) or not isinstance(drink_id, int):
+            raise ValueError
+        return section_id, drink_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
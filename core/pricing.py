@@ -0,0 +1,48 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from models.models import Drink, DrinkVolumePrice
+
+
+def effective_sale(sale: Optional[int], global_sale: Optional[int]) -> int:
+    """Действующий процент скидки: скидка объема, иначе глобальная скидка напитка"""
+    return sale or global_sale or 0
+
+
+def final_price(price: int, sale_percent: int) -> int:
+    """Цена за единицу с учетом скидки"""
+    return round(price * (100 - sale_percent) / 100)
+
+
+def pricing_fields(price: int, sale: Optional[int], global_sale: Optional[int]) -> dict:
+    """Значения материализованных колонок effective_sale и price_final"""
+    sale_percent = effective_sale(sale, global_sale)
+    return {"effective_sale": sale_percent, "price_final": final_price(price, sale_percent)}
+
+
+def apply_pricing(volume_price: DrinkVolumePrice, global_sale: Optional[int]):
+    """Пересчитывает итоговую цену объема после изменения price/sale"""
+    for field, value in pricing_fields(volume_price.price, volume_price.sale, global_sale).items():
+        setattr(volume_price, field, value)
+
+
+def refresh_drink_prices(session: Session, drink_ids: Iterable[int]):
+    """
+    Пересчитывает итоговые цены всех объемов напитков (например, после смены global_sale).
+    Один SELECT и один пакетный UPDATE по первичному ключу; коммит - на стороне вызывающего.
+    """
+    drink_ids = list(drink_ids)
+    if not drink_ids:
+        return
+    rows = session.exec(
+        select(DrinkVolumePrice.id, DrinkVolumePrice.price, DrinkVolumePrice.sale, Drink.global_sale)
+        .join(Drink, DrinkVolumePrice.drink_id == Drink.id)
+        .where(DrinkVolumePrice.drink_id.in_(drink_ids))
+    ).all()
+    if rows:
+        session.execute(update(DrinkVolumePrice), [
+            {"id": volume_id, **pricing_fields(price, sale, global_sale)}
+            for volume_id, price, sale, global_sale in rows
+        ])
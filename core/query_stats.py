@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from core.config import settings
+
+
+class QueryStats:
+    """SQL-запросы одного HTTP-запроса (или блока assert_query_budget): количество, время, повторы"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_time += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int = None) -> List[Tuple[str, int]]:
+        """
+        Одинаковые запросы, выполненные threshold и более раз - вероятный N+1.
+        Параметры в текст запроса не входят, поэтому запрос в цикле по разным ID - один и тот же текст.
+        """
+        threshold = threshold or settings.QUERY_N_PLUS_ONE_THRESHOLD
+        return [(statement, times) for statement, times in self.statements.most_common() if times >= threshold]
+
+
+# Статистика текущего HTTP-запроса (задается QueryStatsMiddleware)
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Активные assert_query_budget: считают все запросы процесса, независимо от потока и контекста
+_captures: List[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Запросы одного соединения выполняются последовательно - достаточно одного значения
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None and not _captures:
+        return
+    seconds = time.perf_counter() - conn.info.get("query_started", time.perf_counter())
+    if stats is not None:
+        stats.record(statement, seconds)
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.record(statement, seconds)
+
+
+class EndpointQueryMetrics:
+    """Сводка по эндпоинтам для /metrics/db: сколько запросов к БД делает каждый и где замечен N+1"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, dict] = {}
+
+    def record(self, endpoint: str, stats: QueryStats, repeated: List[Tuple[str, int]]):
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {
+                "requests": 0, "queries": 0, "max_queries": 0, "db_time": 0.0, "n_plus_one": {}
+            })
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["db_time"] += stats.total_time
+            for statement, times in repeated:
+                entry["n_plus_one"][statement] = max(entry["n_plus_one"].get(statement, 0), times)
+
+    def snapshot(self) -> dict:
+        """Сводка; текст запросов N+1 - только если разрешен settings.query_stats_statements()"""
+        show_statements = settings.query_stats_statements()
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": entry["requests"],
+                    "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                    "max_queries": entry["max_queries"],
+                    "avg_db_ms": round(entry["db_time"] / entry["requests"] * 1000, 2),
+                    "n_plus_one": [
+                        {"statement": statement, "max_repeats": times} if show_statements else {"max_repeats": times}
+                        for statement, times in sorted(entry["n_plus_one"].items(), key=lambda item: -item[1])
+                    ],
+                }
+                for endpoint, entry in sorted(self._endpoints.items())
+            }
+
+
+query_metrics = EndpointQueryMetrics()
+
+
+def _server_timing(stats: QueryStats, repeated: List[Tuple[str, int]]) -> str:
+    """
+    Значение Server-Timing: время и число запросов к БД (видно в DevTools).
+    Начало текста повторяющихся запросов добавляется, только если разрешен settings.query_stats_statements():
+    заголовок доступен скриптам фронтенда через CORS.
+    """
+    metrics = [f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} SQL"']
+    if not settings.query_stats_statements():
+        return metrics[0]
+    for index, (statement, times) in enumerate(repeated[:3]):
+        summary = " ".join(statement.split())[:80].replace('"', "'").replace("\\", "")
+        metrics.append(f'n-plus-one-{index};desc="x{times} {summary}"')
+    return ", ".join(metrics)
+
+
+class QueryStatsMiddleware:
+    """
+    Считает SQL-запросы каждого HTTP-запроса (всех движков, включая реплики и async),
+    добавляет заголовок Server-Timing и собирает сводку по эндпоинтам для /metrics/db.
+    Запросы после начала ответа (потоковая выгрузка, фоновые задачи) в заголовок не попадают.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                repeated = stats.repeated()
+                MutableHeaders(scope=message).append("Server-Timing", _server_timing(stats, repeated))
+                # Маршрут известен после роутинга: FastAPI кладет его в scope
+                route = scope.get("route")
+                endpoint = f"{scope['method']} {route.path if route is not None else scope['path']}"
+                query_metrics.record(endpoint, stats, repeated)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Проверка бюджета запросов эндпоинта в тестах:
+
+        with assert_query_budget(4):
+            client.get("/cart/")
+
+    Считаются все запросы процесса внутри блока (TestClient выполняет приложение в другом потоке).
+    max_repeats - сколько раз может выполниться один и тот же запрос (для ловли N+1).
+    """
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} запросов при бюджете {max_queries}")
+    if max_repeats is not None:
+        problems.extend(
+            f"запрос выполнен {times} раз (допустимо {max_repeats}): {statement}"
+            for statement, times in stats.repeated(max_repeats + 1)
+        )
+    if problems:
+        executed = "\n".join(f"  x{times} {statement}" for statement, times in stats.statements.most_common())
+        raise AssertionError("; ".join(problems) + "\nВыполненные запросы:\n" + executed)
@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import event, make_url, text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+from core.database import build_engine, engine, pool_status
+
+# Кука "читать из основной БД до момента T" после записи пользователя
+STICKY_COOKIE = "db_primary_until"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class Replica:
+    """Реплика для чтения и результат ее последней проверки"""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = build_engine(url)
+        self.healthy = True
+        self.lag_seconds: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+        @event.listens_for(self.engine, "handle_error")
+        def mark_down(context):
+            # Обрыв соединения - не ждем следующей проверки, сразу убираем реплику из ротации
+            if context.is_disconnect:
+                self.healthy = False
+                self.last_error = str(context.original_exception)
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтений: запросы через get_read_session идут на реплики по кругу,
+    запись и все остальное - в основную БД (engine).
+
+    Основная БД используется и для чтения, если:
+    - реплик нет или все они не прошли проверку;
+    - пользователь недавно что-то изменил (кука STICKY_COOKIE) - он сразу видит свои изменения;
+    - в этом процессе недавно изменился каталог - иначе кэш каталога заполнился бы
+      данными реплики, которая еще не получила изменение.
+    """
+
+    def __init__(self, urls: List[str], sticky_seconds: int, check_seconds: int, max_lag_seconds: Optional[int]):
+        self.replicas = [Replica(url) for url in urls]
+        self.sticky_seconds = sticky_seconds
+        self.check_seconds = check_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._primary_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def is_sticky(self, request: Request) -> bool:
+        """Пользователь писал в БД меньше sticky_seconds назад"""
+        try:
+            until = float(request.cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return False
+        now = time.time()
+        # Значение из будущего дальше окна - подделка или сбитые часы, игнорируем
+        return now < until <= now + self.sticky_seconds
+
+    def mark_write(self):
+        """Все чтения этого процесса идут в основную БД в течение sticky_seconds"""
+        self._primary_until = time.monotonic() + self.sticky_seconds
+
+    def engine_for(self, request: Optional[Request] = None) -> Engine:
+        """Движок для чтения: следующая исправная реплика или основная БД"""
+        if not self.replicas or time.monotonic() < self._primary_until:
+            return engine
+        if request is not None and self.is_sticky(request):
+            return engine
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return engine
+        with self._lock:
+            index = next(self._counter)
+        return healthy[index % len(healthy)].engine
+
+    def check(self):
+        """Проверяет реплики: соединение и (если задан max_lag_seconds) отставание репликации"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                    replica.lag_seconds = self._lag(conn) if self.max_lag_seconds is not None else None
+                lagging = replica.lag_seconds is not None and replica.lag_seconds > self.max_lag_seconds
+                replica.healthy = not lagging
+                replica.last_error = f"Отставание {replica.lag_seconds} с" if lagging else None
+            except Exception as e:
+                replica.healthy = False
+                replica.last_error = str(e)
+
+    @staticmethod
+    def _lag(conn) -> Optional[int]:
+        """Seconds_Behind_Source из SHOW REPLICA STATUS (нужна привилегия REPLICATION CLIENT)"""
+        if conn.dialect.name != "mysql":
+            return None
+        row = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+        if row is None:
+            return None
+        lag = row.get("Seconds_Behind_Source")
+        # NULL - поток репликации остановлен, данные могут отставать сколько угодно
+        return int(lag) if lag is not None else 10 ** 9
+
+    def start(self):
+        if self.replicas:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    async def _run(self):
+        while True:
+            await run_in_threadpool(self.check)
+            await asyncio.sleep(self.check_seconds)
+
+    def status(self) -> list:
+        """Состояние реплик для /healthz"""
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+                "last_error": replica.last_error,
+                "pool": pool_status(replica.engine.pool),
+            }
+            for replica in self.replicas
+        ]
+
+
+class ReplicaStickinessMiddleware:
+    """
+    После успешного изменяющего запроса ставит куку STICKY_COOKIE:
+    следующие sticky_seconds чтения этого пользователя идут в основную БД (read-your-writes).
+    """
+
+    def __init__(self, app, router: "ReplicaRouter"):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or not self.router.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[STICKY_COOKIE] = str(int(time.time()) + self.router.sticky_seconds)
+                cookie[STICKY_COOKIE].update({
+                    "max-age": self.router.sticky_seconds,
+                    "path": "/",
+                    "httponly": True,
+                    "secure": True,
+                    "samesite": "none",
+                    "domain": "graduate-work-backend.onrender.com",
+                })
+                MutableHeaders(scope=message).append("set-cookie", cookie.output(header="").strip())
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+replica_router = ReplicaRouter(
+    urls=[url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS,
+    check_seconds=settings.DB_REPLICA_CHECK_SECONDS,
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+)
+
+# Изменение каталога: кэш каталога не должен заполниться данными отстающей реплики
+catalog_cache.subscribe(lambda drink_ids: replica_router.mark_write())
+
+
+def get_read_session(request: Request):
+    """Сессия только для чтения: реплика или основная БД (см. ReplicaRouter)"""
+    with Session(replica_router.engine_for(request)) as session:
+        yield session
@@ -1,11 +1,64 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from fastapi import HTTPException, UploadFile
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 import uuid
 from core.config import settings
 
+MB = 1024 * 1024
+
+
+class UploadMetrics:
+    """Статистика загрузок в S3: количество, объем, ошибки и задержки (по последним N загрузкам)"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.uploads = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, size: Optional[int], ok: bool):
+        with self._lock:
+            if not ok:
+                self.errors += 1
+                return
+            self.uploads += 1
+            self.bytes += size or 0
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self._latencies.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "uploads": self.uploads,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "avg_ms": round(self.total_seconds / self.uploads * 1000, 1) if self.uploads else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(self.max_seconds * 1000, 1) if self.uploads else None,
+        }
+
 
 class S3Service:
     def __init__(self):
@@ -13,18 +66,38 @@ class S3Service:
             's3',
             endpoint_url=settings.YC_ENDPOINT_URL,
             aws_access_key_id=settings.YC_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.YC_SECRET_ACCESS_KEY
+            aws_secret_access_key=settings.YC_SECRET_ACCESS_KEY,
+            # Пул соединений должен покрывать все потоки загрузки и части multipart
+            config=Config(max_pool_connections=settings.S3_UPLOAD_WORKERS * settings.S3_MULTIPART_CONCURRENCY)
         )
         self.bucket = settings.YC_BUCKET_NAME
+        # Файлы больше порога загружаются по частям (multipart) параллельно, файл читается кусками
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * MB,
+            max_concurrency=settings.S3_MULTIPART_CONCURRENCY
+        )
+        # Ограниченный пул потоков для блокирующих вызовов boto3 из async-эндпоинтов
+        self._executor = ThreadPoolExecutor(max_workers=settings.S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
+        self.metrics = UploadMetrics()
+
+    def public_url(self, key: str) -> str:
+        return f"https://{self.bucket}.storage.yandexcloud.net/{key}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Ключ объекта по публичному URL (None - URL не из нашего бакета)"""
+        prefix = self.public_url("")
+        return url[len(prefix):] if url and url.startswith(prefix) else None
 
     def upload_file(self, file: UploadFile, folder: str,
-                    filename: Optional[str] = None) -> str:
+                    filename: Optional[str] = None, cache_control: Optional[str] = None) -> str:
         """
         Загружает файл в Yandex Object Storage
 
         :param file: FastAPI UploadFile объект
         :param folder: Папка в бакете (sections/products)
         :param filename: Имя файла (если None - генерируется автоматически)
+        :param cache_control: Заголовок Cache-Control, с которым объект будет отдаваться
         :return: Публичный URL файла
         """
         try:
@@ -34,16 +107,26 @@ class S3Service:
                 filename = f"{uuid.uuid4()}{ext}"
 
             key = f"{folder}/{filename}"
+            extra_args = {'ContentType': file.content_type}
+            if cache_control:
+                extra_args['CacheControl'] = cache_control
 
             # Загрузка файла
-            self.s3.upload_fileobj(
-                file.file,
-                self.bucket,
-                key,
-                ExtraArgs={'ContentType': file.content_type}
-            )
+            started = time.perf_counter()
+            try:
+                self.s3.upload_fileobj(
+                    file.file,
+                    self.bucket,
+                    key,
+                    ExtraArgs=extra_args,
+                    Config=self.transfer_config
+                )
+            except Exception:
+                self.metrics.record(time.perf_counter() - started, file.size, ok=False)
+                raise
+            self.metrics.record(time.perf_counter() - started, file.size, ok=True)
 
-            return f"https://{self.bucket}.storage.yandexcloud.net/{key}"
+            return self.public_url(key)
 
         except NoCredentialsError:
             raise HTTPException(
@@ -56,6 +139,110 @@ class S3Service:
                 detail=f"S3 upload error: {str(e)}"
             )
 
+    def upload_bytes(self, data: bytes, folder: str, filename: str, content_type: str,
+                     cache_control: Optional[str] = None) -> str:
+        """Загружает содержимое из памяти (например, сгенерированные превью), возвращает публичный URL"""
+        key = f"{folder}/{filename}"
+        extra_args = {'CacheControl': cache_control} if cache_control else {}
+        started = time.perf_counter()
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type, **extra_args)
+        except ClientError as e:
+            self.metrics.record(time.perf_counter() - started, len(data), ok=False)
+            raise HTTPException(
+                status_code=500,
+                detail=f"S3 upload error: {str(e)}"
+            )
+        self.metrics.record(time.perf_counter() - started, len(data), ok=True)
+        return self.public_url(key)
+
+    def touch(self, key: str) -> bool:
+        """
+        Проверяет, что объект уже есть, и обновляет его LastModified копированием на себя.
+        Так повторно используемый объект не попадет под сборку мусора сразу после проверки.
+        """
+        try:
+            head = self.s3.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        extra_args = {'CacheControl': head['CacheControl']} if head.get('CacheControl') else {}
+        self.s3.copy_object(
+            Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': key},
+            MetadataDirective='REPLACE', ContentType=head.get('ContentType', 'binary/octet-stream'), **extra_args
+        )
+        return True
+
+    def iter_objects(self, prefix: str):
+        """Все объекты с префиксом: пары (ключ, LastModified)"""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'], obj['LastModified']
+
+    def head(self, key: str) -> Optional[dict]:
+        """Метаданные объекта (размер, тип, LastModified) без чтения содержимого; None - объекта нет"""
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def last_modified(self, key: str):
+        """LastModified объекта или None, если его нет"""
+        head = self.head(key)
+        return head['LastModified'] if head else None
+
+    def presigned_post(self, key: str, content_type: str, max_size: int, expires_in: int,
+                       cache_control: Optional[str] = None) -> dict:
+        """
+        Подписанная POST-политика для загрузки файла напрямую из браузера, минуя сервер.
+        Хранилище само проверяет ключ, Content-Type и размер (не больше max_size байт).
+        Подпись считается локально, запроса к хранилищу нет.
+
+        :return: {"url": ..., "fields": {...}} - поля формы, файл передается последним полем "file"
+        """
+        fields = {'Content-Type': content_type}
+        conditions = [{'Content-Type': content_type}, ['content-length-range', 1, max_size]]
+        if cache_control:
+            fields['Cache-Control'] = cache_control
+            conditions.append({'Cache-Control': cache_control})
+        return self.s3.generate_presigned_post(
+            Bucket=self.bucket, Key=key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in
+        )
+
+    def delete_keys(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Пакетное удаление (до 1000 ключей за запрос).
+        Возвращает ключи, которые не удалось удалить, с текстом ошибки.
+        """
+        failed = {}
+        for i in range(0, len(keys), 1000):
+            response = self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]], 'Quiet': True}
+            )
+            # В режиме Quiet ответ содержит только ошибки
+            for error in response.get('Errors', []):
+                failed[error['Key']] = f"{error.get('Code')}: {error.get('Message')}"
+        return failed
+
+    async def run_in_pool(self, func, *args):
+        """Выполняет блокирующую функцию в пуле потоков загрузки"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def upload_file_async(self, file: UploadFile, folder: str,
+                                filename: Optional[str] = None) -> str:
+        """Загрузка файла в пуле потоков, не блокируя event loop (параметры как у upload_file)"""
+        return await self.run_in_pool(self.upload_file, file, folder, filename)
+
+    def shutdown(self):
+        """Дожидается завершения загрузок при остановке приложения"""
+        self._executor.shutdown(wait=True)
+
     def delete_file(self, folder: str, filename: str) -> bool:
         """
         Удаляет файл из хранилища
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta, UTC
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.database import engine
+from core.image_gc import is_stale, referenced_urls
+from core.s3 import s3_service
+from models.models import S3Deletion
+
+
+def enqueue_deletion(session: Session, urls: Iterable[Optional[str]], check_references: bool = True):
+    """
+    Ставит файлы в очередь на удаление. Коммит делает вызывающий код - вместе со своими изменениями,
+    поэтому файл удаляется только если изменение в БД действительно сохранилось.
+
+    С check_references файл удаляется не раньше чем через IMAGE_GC_GRACE_SECONDS и только если
+    на него к тому моменту никто не ссылается (ключи изображений общие для одинаковых файлов).
+    """
+    keys = {
+        s3_service.key_from_url(url)
+        for url in urls
+        if url and "default.webp" not in url
+    } - {None}
+    if not keys:
+        return
+
+    delay = settings.IMAGE_GC_GRACE_SECONDS if check_references else 0
+    next_attempt_at = datetime.now(UTC) + timedelta(seconds=delay)
+    session.add_all(
+        S3Deletion(key=key, check_references=check_references, next_attempt_at=next_attempt_at)
+        for key in sorted(keys)
+    )
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Экспоненциальная задержка повтора: base, 2*base, 4*base, ... не больше максимума"""
+    seconds = settings.S3_DELETE_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.S3_DELETE_RETRY_MAX_SECONDS))
+
+
+def drain(batch_size: int = settings.S3_DELETE_BATCH_SIZE) -> int:
+    """
+    Обрабатывает одну пачку готовых к удалению строк, возвращает их количество.
+
+    Три шага, запросы к хранилищу - вне транзакции:
+    1. Строки выбираются через SELECT ... FOR UPDATE SKIP LOCKED и "арендуются": next_attempt_at
+       сдвигается на S3_DELETE_LEASE_SECONDS, транзакция сразу коммитится. Другие процессы
+       эту пачку не возьмут, пока аренда не истечет.
+    2. Без открытой транзакции: HEAD для строк с check_references и один DeleteObjects на все ключи.
+    3. Короткой транзакцией удаляются обработанные строки, остальные откладываются
+       (ошибки по отдельным ключам откладывают только эти строки).
+    """
+    now = datetime.now(UTC)
+    # DATETIME в MySQL хранится с точностью до секунды - по этому значению строка узнается на шаге 3
+    lease_until = (now + timedelta(seconds=settings.S3_DELETE_LEASE_SECONDS)).replace(microsecond=0)
+
+    # 1. Аренда пачки
+    with Session(engine) as session:
+        rows = session.exec(
+            select(S3Deletion)
+            .where(S3Deletion.next_attempt_at <= now)
+            .order_by(S3Deletion.next_attempt_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return 0
+
+        claimed = [(row.id, row.key, row.check_references, row.attempts) for row in rows]
+        used = referenced_urls(session, {s3_service.public_url(row.key) for row in rows if row.check_references})
+        for row in rows:
+            row.next_attempt_at = lease_until
+        session.commit()
+
+    # 2. Запросы к хранилищу
+    done: List[int] = []
+    postponed: Dict[int, dict] = {}  # ID строки -> новые значения полей
+    to_delete: Dict[str, Tuple[int, int]] = {}  # Ключ -> (ID строки, attempts)
+    for row_id, key, check_references, attempts in claimed:
+        if not check_references:
+            to_delete[key] = (row_id, attempts)
+            continue
+        # Файл снова используется - удалять не нужно
+        if s3_service.public_url(key) in used:
+            done.append(row_id)
+            continue
+        # Файл недавно переиспользовали (touch) - ждем, пока ссылка на него сохранится в БД
+        try:
+            last_modified = s3_service.last_modified(key)
+        except (BotoCoreError, ClientError) as e:
+            postponed[row_id] = _postponed(attempts, now, str(e))
+            continue
+        if last_modified is None:
+            done.append(row_id)
+        elif not is_stale(last_modified):
+            postponed[row_id] = {"next_attempt_at": last_modified + timedelta(seconds=settings.IMAGE_GC_GRACE_SECONDS)}
+        else:
+            to_delete[key] = (row_id, attempts)
+
+    if to_delete:
+        try:
+            failed = s3_service.delete_keys(list(to_delete))
+        except (BotoCoreError, ClientError) as e:
+            failed = dict.fromkeys(to_delete, str(e))
+        for key, (row_id, attempts) in to_delete.items():
+            if key in failed:
+                postponed[row_id] = _postponed(attempts, now, failed[key])
+            else:
+                done.append(row_id)
+
+    # 3. Итог пачки
+    with Session(engine) as session:
+        if done:
+            session.exec(delete(S3Deletion).where(S3Deletion.id.in_(done)))
+        for row_id, values in postponed.items():
+            # Аренда истекла и строку взял другой процесс - итог за ним
+            session.exec(
+                update(S3Deletion)
+                .where(S3Deletion.id == row_id, S3Deletion.next_attempt_at == lease_until)
+                .values(**values)
+            )
+        session.commit()
+    return len(claimed)
+
+
+def _postponed(attempts: int, now: datetime, error: str) -> dict:
+    """Значения полей строки после неудачной попытки"""
+    return {
+        "attempts": attempts + 1,
+        "next_attempt_at": now + _retry_delay(attempts + 1),
+        "last_error": error[:512],
+    }
+
+
+class S3DeletionWorker:
+    """Фоновая задача, которая разбирает очередь удаления, пока работает приложение"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await s3_service.run_in_pool(drain)
+            except Exception:
+                # БД или хранилище недоступны - строки остаются в очереди до следующей проверки
+                processed = 0
+            # Полная пачка - в очереди, вероятно, есть еще, продолжаем без паузы
+            if processed < settings.S3_DELETE_BATCH_SIZE:
+                await asyncio.sleep(settings.S3_DELETE_POLL_SECONDS)
+
+
+s3_deletion_worker = S3DeletionWorker()
+
+
+if __name__ == "__main__":
+    # CLI: python -m core.s3_outbox - разобрать все готовые строки очереди (например, из cron)
+    parser = argparse.ArgumentParser(description="Удаление файлов из очереди S3")
+    parser.add_argument("--batch-size", type=int, default=settings.S3_DELETE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    total = 0
+    while (processed := drain(args.batch_size)) == args.batch_size:
+        total += processed
+    print(f"Обработано строк: {total + processed}")
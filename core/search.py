@@ -0,0 +1,343 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from core.catalog_cache import catalog_cache
+from core.config import settings
+from models.models import Drink
+
+
+# ─────────────────────── Токенизация и стемминг ───────────────────────
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-я]+")
+_VOWELS = set("аеиоуыэюя")
+
+# Окончания по алгоритму Snowball (Портер) для русского языка
+_PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")  # после а/я
+_PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+_ADJECTIVE = ("ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой",
+              "ем", "им", "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею")
+_PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")  # после а/я
+_PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+_REFLEXIVE = ("ся", "сь")
+_VERB_1 = ("ешь", "нно", "ете", "йте", "ла", "на", "ли", "ем", "ло", "но", "ет", "ют", "ны", "ть", "й", "л", "н")  # после а/я
+_VERB_2 = ("ейте", "уйте", "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено", "ует", "уют", "ены",
+           "ить", "ыть", "ишь", "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую", "ю")
+_NOUN = ("иями", "ями", "ами", "ией", "иям", "ием", "иях", "ев", "ов", "ие", "ье", "еи", "ии", "ей", "ой", "ий",
+         "ям", "ем", "ам", "ом", "ах", "ях", "ию", "ью", "ия", "ья", "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я")
+_SUPERLATIVE = ("ейше", "ейш")
+_DERIVATIONAL = ("ость", "ост")
+
+
+def _longest_first(endings: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+(_PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2, _ADJECTIVE, _PARTICIPLE_1, _PARTICIPLE_2, _REFLEXIVE,
+ _VERB_1, _VERB_2, _NOUN, _SUPERLATIVE, _DERIVATIONAL) = map(_longest_first, (
+    _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2, _ADJECTIVE, _PARTICIPLE_1, _PARTICIPLE_2, _REFLEXIVE,
+    _VERB_1, _VERB_2, _NOUN, _SUPERLATIVE, _DERIVATIONAL))
+
+
+def _strip(word: str, start: int, endings: Tuple[str, ...], after_a_ya: bool = False) -> Optional[str]:
+    """Отрезает самое длинное подходящее окончание, лежащее в области word[start:]"""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            stem = word[:-len(ending)]
+            if after_a_ya and not (len(stem) > start and stem[-1] in "ая"):
+                continue
+            return stem
+    return None
+
+
+def _region_after_vc(word: str, start: int = 0) -> int:
+    """Начало области после первого сочетания гласная+согласная (R1/R2 в Snowball)"""
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+@lru_cache(maxsize=100_000)
+def stem_ru(word: str) -> str:
+    """Упрощенный стеммер Snowball для русского языка"""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    r2 = _region_after_vc(word, _region_after_vc(word))
+
+    # Шаг 1: деепричастие, иначе возвратность + прилагательное/причастие/глагол/существительное
+    stem = _strip(word, rv, _PERFECTIVE_GERUND_1, after_a_ya=True) or _strip(word, rv, _PERFECTIVE_GERUND_2)
+    if stem is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        stem = _strip(word, rv, _ADJECTIVE)
+        if stem is not None:
+            stem = (_strip(stem, rv, _PARTICIPLE_1, after_a_ya=True)
+                    or _strip(stem, rv, _PARTICIPLE_2)
+                    or stem)
+        else:
+            stem = (_strip(word, rv, _VERB_1, after_a_ya=True)
+                    or _strip(word, rv, _VERB_2)
+                    or _strip(word, rv, _NOUN)
+                    or word)
+    word = stem
+
+    # Шаг 2: конечная "и"
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3: словообразовательные окончания в R2
+    word = _strip(word, max(rv, r2), _DERIVATIONAL) or word
+
+    # Шаг 4: превосходная степень, двойная "н", мягкий знак
+    word = _strip(word, rv, _SUPERLATIVE) or word
+    if word.endswith("нн") and len(word) - 1 >= rv:
+        word = word[:-1]
+    elif word.endswith("ь") and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Разбивает текст на нормализованные термы (нижний регистр, ё -> е, стемминг)"""
+    if not text:
+        return []
+    text = text.lower().replace("ё", "е")
+    return [stem_ru(token) if not token.isdigit() else token for token in _TOKEN_RE.findall(text)]
+
+
+# ─────────────────────── Инвертированный индекс ───────────────────────
+
+class SearchIndex:
+    """
+    Инвертированный индекс по name, ingredients и product_description напитков.
+
+    Ранжирование - BM25, совпадения в названии весят больше. Вклад терма в документ
+    (без idf) считается заранее, а списки документов по терму хранятся отсортированными
+    по этому вкладу, поэтому top-k находится алгоритмом порогов (Fagin TA) без обхода
+    всех документов с частыми термами. Списки читаются не на одной глубине, а по
+    наибольшему оставшемуся вкладу: лучшие документы находятся первыми. Если порог
+    не доказывает top-k за SEARCH_MAX_SCORED_DOCS документов (много одинаковых весов
+    у частых термов), возвращаются лучшие из уже оцененных.
+
+    Индекс строится при первом поиске, затем обновляется точечно: изменения каталога
+    в этом процессе (catalog_cache.bump) помечают напитки как "грязные", и при следующем
+    поиске перечитываются только они. Изменения из других воркеров подхватываются в фоне
+    раз в CATALOG_CACHE_TTL_SECONDS (как и кэш каталога): индексируемые поля перечитываются
+    целиком, заново индексируются только изменившиеся напитки. Раз в SEARCH_INDEX_REBUILD_SECONDS
+    индекс в фоне строится заново (обновляется средняя длина документа). Поиск во время
+    фонового обновления идет по текущему индексу.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    FIELD_WEIGHTS = (("name", 3), ("ingredients", 1), ("product_description", 1))
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = {}  # терм -> {ID напитка: вклад BM25 без idf}
+        self._ranked: Dict[str, Tuple[List[float], List[int]]] = {}  # терм -> (вклады, ID) по убыванию
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._sources: Dict[int, int] = {}  # ID напитка -> хэш индексируемых полей
+        self._avg_len = 1.0
+        self._built = False
+        self._refresh_at = 0.0
+        self._rebuild_at = 0.0
+        self._dirty: Set[int] = set()
+        self._changes = 0  # Счетчик изменений каталога: фоновое обновление не затирает более свежие
+        self._background: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # --- Обновление индекса ---
+
+    def invalidate(self, drink_ids: Optional[List[int]]):
+        """Обработчик изменений каталога"""
+        with self._lock:
+            self._changes += 1
+            if drink_ids is None:
+                self._built = False
+            else:
+                self._dirty.update(drink_ids)
+
+    @staticmethod
+    def _select_indexed():
+        """Выбираем только индексируемые колонки, без загрузки ORM-объектов"""
+        return select(Drink.id, Drink.name, Drink.ingredients, Drink.product_description)
+
+    def _term_frequencies(self, drink) -> Counter:
+        terms = Counter()
+        for field, weight in self.FIELD_WEIGHTS:
+            for term in tokenize(getattr(drink, field)):
+                terms[term] += weight
+        return terms
+
+    @staticmethod
+    def _source_hash(drink) -> int:
+        return hash((drink.name, drink.ingredients, drink.product_description))
+
+    def _add(self, drink, terms: Counter):
+        norm = self.K1 * (1 - self.B + self.B * sum(terms.values()) / self._avg_len)
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[drink.id] = tf * (self.K1 + 1) / (tf + norm)
+            self._ranked.pop(term, None)
+        self._doc_terms[drink.id] = list(terms)
+        self._sources[drink.id] = self._source_hash(drink)
+
+    def _remove(self, drink_id: int):
+        self._sources.pop(drink_id, None)
+        for term in self._doc_terms.pop(drink_id, ()):
+            postings = self._postings[term]
+            del postings[drink_id]
+            if not postings:
+                del self._postings[term]
+            self._ranked.pop(term, None)
+
+    def _build(self, drinks: list):
+        """Полная перестройка по строкам (id, name, ingredients, product_description)"""
+        docs = [(drink, self._term_frequencies(drink)) for drink in drinks]
+        # Средняя длина документа фиксируется при полной перестройке
+        self._avg_len = max(sum(sum(terms.values()) for _, terms in docs) / max(len(docs), 1), 1.0)
+        self._postings, self._ranked, self._doc_terms, self._sources = {}, {}, {}, {}
+        for drink, terms in docs:
+            self._add(drink, terms)
+
+    def _schedule(self, rebuilt: bool):
+        now = time.monotonic()
+        self._refresh_at = now + settings.CATALOG_CACHE_TTL_SECONDS
+        if rebuilt:
+            self._rebuild_at = now + settings.SEARCH_INDEX_REBUILD_SECONDS
+
+    def _ensure_fresh(self, session: Session):
+        if not self._built:
+            self._build(session.exec(self._select_indexed()).all())
+            self._dirty.clear()
+            self._built = True
+            self._schedule(rebuilt=True)
+            return
+
+        if self._dirty:
+            dirty, self._dirty = self._dirty, set()
+            for drink_id in dirty:
+                self._remove(drink_id)
+            for drink in session.exec(self._select_indexed().where(Drink.id.in_(dirty))).all():
+                self._add(drink, self._term_frequencies(drink))
+
+        if self._refresh_at <= time.monotonic() and self._background is None:
+            self._background = threading.Thread(
+                target=self._refresh, args=(session.get_bind(), self._rebuild_at <= time.monotonic()),
+                name="search-index-refresh", daemon=True
+            )
+            self._background.start()
+
+    def _refresh(self, bind, rebuild: bool):
+        """
+        Фоновое обновление: изменения, сделанные другими воркерами.
+        Чтение и токенизация идут без блокировки - поиск в это время работает по текущему индексу.
+        """
+        try:
+            with self._lock:
+                changes = self._changes
+            with Session(bind) as session:
+                drinks = session.exec(self._select_indexed()).all()
+
+            if rebuild:
+                fresh = SearchIndex()
+                fresh._build(drinks)
+                with self._lock:
+                    if self._changes == changes and self._built:
+                        self._postings, self._ranked = fresh._postings, fresh._ranked
+                        self._doc_terms, self._sources, self._avg_len = fresh._doc_terms, fresh._sources, fresh._avg_len
+                        self._schedule(rebuilt=True)
+                return
+
+            current = {drink.id: drink for drink in drinks}
+            sources = self._sources
+            changed = [drink for drink in drinks if sources.get(drink.id) != self._source_hash(drink)]
+            removed = [drink_id for drink_id in list(sources) if drink_id not in current]
+            updates = [(drink, self._term_frequencies(drink)) for drink in changed]
+            with self._lock:
+                # Каталог изменился в этом процессе, пока шло чтение - применим в следующий раз
+                if self._changes == changes and self._built:
+                    for drink_id in removed:
+                        self._remove(drink_id)
+                    for drink, terms in updates:
+                        self._remove(drink.id)
+                        self._add(drink, terms)
+                    self._schedule(rebuilt=False)
+        except Exception:
+            # БД недоступна - повторим при следующем поиске после refresh_at
+            with self._lock:
+                self._refresh_at = time.monotonic() + settings.CATALOG_CACHE_TTL_SECONDS
+        finally:
+            self._background = None
+
+    def _ranked_postings(self, term: str) -> Tuple[List[float], List[int]]:
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            pairs = sorted(((weight, drink_id) for drink_id, weight in self._postings[term].items()), reverse=True)
+            ranked = ([weight for weight, _ in pairs], [drink_id for _, drink_id in pairs])
+            self._ranked[term] = ranked
+        return ranked
+
+    # --- Поиск ---
+
+    def search(self, session: Session, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """Возвращает до limit пар (ID напитка, релевантность) по убыванию релевантности"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            self._ensure_fresh(session)
+            doc_count = len(self._doc_terms)
+            lists = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings:
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    lists.append((idf, postings.get, *self._ranked_postings(term)))
+            scorers = [(idf, get) for idf, get, _, _ in lists]
+
+            # Алгоритм порогов: берем документ с наибольшим вкладом среди непросмотренных позиций
+            # всех списков, пока k-й результат не превысит порог - сумму этих вкладов
+            heads = [(-idf * weights[0], index, 0) for index, (idf, _, weights, _) in enumerate(lists)]
+            heapq.heapify(heads)
+            threshold = -sum(head[0] for head in heads)
+            budget = settings.SEARCH_MAX_SCORED_DOCS or math.inf
+            top: List[Tuple[float, int]] = []
+            seen: Set[int] = set()
+            while heads:
+                if len(top) >= limit and (top[0][0] >= threshold or len(seen) >= budget):
+                    break
+                contribution, index, position = heads[0]
+                idf, _, weights, drink_ids = lists[index]
+                drink_id = drink_ids[position]
+                position += 1
+                if position < len(weights):
+                    next_contribution = -idf * weights[position]
+                    heapq.heapreplace(heads, (next_contribution, index, position))
+                    threshold += next_contribution - contribution
+                else:
+                    heapq.heappop(heads)
+                    threshold += contribution
+                if drink_id in seen:
+                    continue
+                seen.add(drink_id)
+                score = 0.0
+                for term_idf, get in scorers:
+                    score += term_idf * get(drink_id, 0.0)
+                if len(top) < limit:
+                    heapq.heappush(top, (score, drink_id))
+                elif score > top[0][0]:
+                    heapq.heapreplace(top, (score, drink_id))
+
+        return [(drink_id, score) for score, drink_id in sorted(top, reverse=True)]
+
+
+# Общий индекс для процесса, обновляется при изменениях каталога
+search_index = SearchIndex()
+catalog_cache.subscribe(search_index.invalidate)
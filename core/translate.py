@@ -1,49 +1,193 @@
-
-import requests
+import asyncio
+import json
+import os
 import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
 from core.config import settings
 
 
-def translate_text(text: str, target_lang: str = "en") -> str:
-    """Перевод текста через Yandex Translate API"""
-    try:
-        response = requests.post(
-            "https://translate.api.cloud.yandex.net/translate/v2/translate",
-            headers={
-                "Authorization": f"Api-Key {settings.YC_TRANSLATE_API_KEY}",
-                "Content-Type": "application/json",
-            },
+# ─────────────────────── Транслитерация ───────────────────────
+
+# Транслитерация по правилам загранпаспорта (приказ МВД 2020): детерминированно и без сети
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "ie", "ы": "y",
+    "ь": "", "э": "e", "ю": "iu", "я": "ia",
+}
+
+
+def transliterate(text: str) -> str:
+    """Перевод кириллицы в латиницу без обращения к API"""
+    return "".join(_TRANSLIT.get(ch, ch) for ch in text.lower())
+
+
+def slugify(text: str) -> str:
+    """Нижний регистр, пробелы и дефисы -> _, удаление спецсимволов"""
+    clean_id = (
+        text.lower()
+        .replace(" ", "_")  # Заменяем пробелы на _
+        .replace("-", "_")  # Заменяем дефисы на _
+    )
+    # Удаляем все спецсимволы, кроме букв, цифр и _
+    return re.sub(r"[^\w_]", "", clean_id)
+
+
+# ─────────────────────── Кэш переводов ───────────────────────
+
+class TranslationCache:
+    """
+    Кэш переводов в памяти с сохранением в JSON-файл.
+    Названия секций повторяются редко, поэтому файл перезаписывается целиком при каждом сохранении.
+    Чтение и запись файла идут в пуле потоков (load/save), не блокируя цикл событий.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._path = Path(path) if path else None
+        self._data: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str, target_lang: str) -> str:
+        return f"{target_lang}:{text}"
+
+    def get(self, text: str, target_lang: str) -> Optional[str]:
+        return self._data.get(self._key(text, target_lang))
+
+    def update(self, translations: Dict[str, str], target_lang: str):
+        """Добавляет переводы в память; на диск их записывает save()"""
+        with self._lock:
+            for text, translated in translations.items():
+                self._data[self._key(text, target_lang)] = translated
+
+    def _read(self):
+        if not (self._path and self._path.exists()):
+            return
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            # Переводы, полученные до загрузки файла, новее сохраненных
+            self._data = {**data, **self._data}
+
+    def _write(self):
+        if not self._path:
+            return
+        with self._lock:
+            content = json.dumps(self._data, ensure_ascii=False, indent=1)
+            # Атомарная запись: временный файл + переименование (под блокировкой - один писатель)
+            tmp_path = self._path.with_suffix(".tmp")
+            try:
+                tmp_path.write_text(content, encoding="utf-8")
+                os.replace(tmp_path, self._path)
+            except OSError:
+                pass  # Кэш на диске не обязателен, в памяти значения уже есть
+
+    async def load(self):
+        """Загружает сохраненные переводы (при старте приложения)"""
+        await asyncio.to_thread(self._read)
+
+    async def save(self):
+        await asyncio.to_thread(self._write)
+
+
+# ─────────────────────── Клиент Yandex Translate ───────────────────────
+
+class YandexTranslator:
+    """
+    Асинхронный клиент Yandex Translate с пулом соединений и кэшем.
+    Клиент httpx создается при первом запросе и переиспользуется (keep-alive),
+    закрывается при остановке приложения (см. lifespan в main.py).
+    """
+
+    MAX_TEXTS_PER_REQUEST = 100
+    MAX_CHARS_PER_REQUEST = 10_000  # Ограничение API на суммарную длину текстов
+
+    def __init__(self, cache: TranslationCache):
+        self.cache = cache
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.TRANSLATE_TIMEOUT_SECONDS),
+                headers={"Authorization": f"Api-Key {settings.YC_TRANSLATE_API_KEY}"},
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _chunks(self, texts: List[str]):
+        chunk, size = [], 0
+        for text in texts:
+            if chunk and (len(chunk) >= self.MAX_TEXTS_PER_REQUEST or size + len(text) > self.MAX_CHARS_PER_REQUEST):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text)
+        if chunk:
+            yield chunk
+
+    async def _request(self, texts: List[str], target_lang: str) -> List[str]:
+        response = await self._get_client().post(
+            settings.YC_TRANSLATE_API_URL,
             json={
                 "folderId": settings.YC_FOLDER_ID,
-                "texts": [text],
+                "texts": texts,
                 "targetLanguageCode": target_lang,
             },
-            timeout=5
         )
         response.raise_for_status()
-        return response.json()["translations"][0]["text"]
-    except Exception as e:
-        raise ValueError(f"Translation failed: {str(e)}")
+        return [item["text"] for item in response.json()["translations"]]
 
+    async def translate_many(self, texts: List[str], target_lang: str = "en") -> List[str]:
+        """Перевод списка текстов: из кэша, остальное - пакетными запросами"""
+        missing = list(dict.fromkeys(text for text in texts if self.cache.get(text, target_lang) is None))
+        try:
+            for chunk in self._chunks(missing):
+                translated = await self._request(chunk, target_lang)
+                self.cache.update(dict(zip(chunk, translated)), target_lang)
+        except Exception as e:
+            raise ValueError(f"Translation failed: {str(e)}")
+        if missing:
+            await self.cache.save()
+        return [self.cache.get(text, target_lang) for text in texts]
 
-def generate_section_id(title: str) -> str:
-    """Генерация ID в формате section-<translated_title>"""
-    try:
-        # Переводим текст
-        translated = translate_text(title)
-
-        # Приводим к нижнему регистру и заменяем пробелы на подчеркивания
-        clean_id = (
-            translated.lower()
-            .replace(" ", "_")  # Заменяем пробелы на _
-            .replace("-", "_")  # Заменяем дефисы на _
-        )
+    async def translate(self, text: str, target_lang: str = "en") -> str:
+        return (await self.translate_many([text], target_lang))[0]
+
+
+translator = YandexTranslator(TranslationCache(settings.TRANSLATE_CACHE_PATH))
 
-        # Удаляем все спецсимволы, кроме букв, цифр и _
-        clean_id = re.sub(r"[^\w_]", "", clean_id)
 
-        # Формируем окончательный ID
-        return f"section-{clean_id}"
+# ─────────────────────── ID секций ───────────────────────
 
-    except Exception as e:
-        raise ValueError(f"ID generation failed: {str(e)}")
\ No newline at end of file
+async def generate_section_ids(titles: List[str]) -> List[str]:
+    """
+    Генерация ID в формате section-<translated_title> для нескольких названий одним запросом.
+    Если API недоступно или не успело ответить за TRANSLATE_TIMEOUT_SECONDS,
+    используется транслитерация - создание секции не зависит от сети.
+    """
+    slugs: List[Optional[str]] = [None] * len(titles)
+    if settings.SECTION_ID_TRANSLATE:
+        try:
+            translated = await asyncio.wait_for(translator.translate_many(titles), settings.TRANSLATE_TIMEOUT_SECONDS)
+            slugs = [slugify(text) for text in translated]
+        except (ValueError, asyncio.TimeoutError):
+            pass
+
+    return [f"section-{slug or slugify(transliterate(title))}" for title, slug in zip(titles, slugs)]
+
+
+async def generate_section_id(title: str) -> str:
+    """Генерация ID в формате section-<translated_title>"""
+    return (await generate_section_ids([title]))[0]
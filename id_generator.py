@@ -1,29 +1,153 @@
-from datetime import datetime
-import random
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import Table, func, insert, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-from typing import Type, Any
+from typing import Type, Any, Dict, List, Optional, Set, Union
 
+import core.database as database
+from core.config import settings
+from models.id_sequence import IdSequence
 
-def generate_unique_id(session: Session, model: Type[Any], max_attempts: int = 5) -> int:
+# Старые ID - случайные 8-значные числа, блоки выдаются выше этого диапазона
+ID_START = 100_000_000
+
+
+class BlockIdAllocator:
     """
-    Генерация 8-значного уникального ID (10,000,000 - 99,999,999)
+    Выдача ID блоками (hi/lo): процесс резервирует в таблице idsequence диапазон из ID_BLOCK_SIZE
+    значений одним UPDATE в отдельной короткой транзакции и дальше раздает ID из памяти.
+    Диапазоны разных процессов не пересекаются (строка счетчика блокируется на время UPDATE),
+    поэтому коллизий нет и проверять ID перед вставкой не нужно.
+    Неиспользованный остаток блока при перезапуске процесса просто пропускается.
+
+    Блоки резервируются заранее, вне транзакций запросов: при старте (prefill) и в фоновом потоке,
+    когда запас таблицы падает ниже половины блока. Запрос не берет второе соединение из пула
+    и не ждет блокировку строки счетчика. Синхронно блок резервируется только если запас кончился
+    (пакет больше запаса или таблица не была подготовлена при старте).
+    ID всех моделей с IDMixin должны идти отсюда: AUTO_INCREMENT выдает max(id) + 1 и попал бы
+    в уже выданный процессу диапазон.
     """
-    for _ in range(max_attempts):
-        # 1. Берем 7 цифр из текущего timestamp (мс)
-        timestamp_part = int(datetime.now().timestamp() * 1000) % 10_000_000
 
-        # 2. Добавляем 1 случайную цифру в начало (чтобы гарантировать 8 цифр)
-        random_prefix = random.randint(1, 9)  # от 1 до 9 (исключаем ведущий ноль)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._blocks: Dict[str, List[range]] = {}  # Имя таблицы -> свободные диапазоны
+        self._refilling: Set[str] = set()  # Таблицы, для которых уже идет фоновое резервирование
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.reservations = 0
+        self._count_lock = threading.Lock()
+
+    def _check_fork(self):
+        # После fork (gunicorn --preload) блоки родителя выдавать нельзя - они общие с другими воркерами,
+        # а поток фонового резервирования в дочерний процесс не переходит
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._blocks.clear()
+            self._refilling.clear()
+            self._executor = None
+
+    @staticmethod
+    def _engine(bind: Union[Engine, Connection]) -> Engine:
+        """Движок для резервирования: отдельная транзакция, не соединение запроса"""
+        engine = bind.engine
+        # sync_engine асинхронного движка работает только внутри greenlet - резервируем через синхронный
+        return database.engine if engine.dialect.is_async else engine
+
+    def _stock(self, name: str) -> int:
+        return sum(len(block) for block in self._blocks.get(name, []))
+
+    def allocate(self, bind: Union[Engine, Connection], table: Optional[Table], name: str, count: int = 1) -> List[int]:
+        engine = self._engine(bind)
+        with self._lock:
+            self._check_fork()
 
-        # 3. Формируем 8-значный ID
-        unique_id = random_prefix * 10_000_000 + timestamp_part
+            ranges = self._blocks.setdefault(name, [])
+            result = []
+            while len(result) < count:
+                if not ranges:
+                    size = max(settings.ID_BLOCK_SIZE, count - len(result))
+                    start = self._reserve(engine, table, name, size)
+                    ranges.append(range(start, start + size))
+                block = ranges[0]
+                taken = block[:count - len(result)]
+                result.extend(taken)
+                if len(taken) == len(block):
+                    ranges.pop(0)
+                else:
+                    ranges[0] = block[len(taken):]
 
-        # 4. Проверяем уникальность (сохраняем оригинальный стиль проверки)
-        result = session.execute(select(model).where(model.id == unique_id)).scalar()
-        if not result:
-            return unique_id
+            # Запас заканчивается - резервируем следующий блок в фоне, пока этот не исчерпан
+            if self._stock(name) < settings.ID_BLOCK_SIZE // 2 and name not in self._refilling:
+                self._refilling.add(name)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="id-refill")
+                self._executor.submit(self._refill, engine, table, name)
+            return result
 
-    raise ValueError("Не удалось сгенерировать уникальный ID")
+    def _refill(self, engine: Engine, table: Optional[Table], name: str):
+        pid = os.getpid()
+        try:
+            start = self._reserve(engine, table, name, settings.ID_BLOCK_SIZE)
+            with self._lock:
+                if os.getpid() == pid:
+                    self._blocks.setdefault(name, []).append(range(start, start + settings.ID_BLOCK_SIZE))
+        except Exception:
+            # БД недоступна - при исчерпании запаса allocate зарезервирует блок сам
+            pass
+        finally:
+            with self._lock:
+                self._refilling.discard(name)
+
+    def prefill(self, bind: Union[Engine, Connection], tables: List[Table]):
+        """Резервирует по блоку для каждой таблицы, у которой нет запаса (при старте приложения)"""
+        engine = self._engine(bind)
+        for table in tables:
+            with self._lock:
+                self._check_fork()
+                if self._stock(table.name):
+                    continue
+            start = self._reserve(engine, table, table.name, settings.ID_BLOCK_SIZE)
+            with self._lock:
+                self._blocks.setdefault(table.name, []).append(range(start, start + settings.ID_BLOCK_SIZE))
+
+    def _reserve(self, engine: Engine, table: Optional[Table], name: str, size: int) -> int:
+        """Резервирует size значений, возвращает первое. Не зависит от транзакции запроса."""
+        for _ in range(3):
+            try:
+                with engine.begin() as conn:
+                    updated = conn.execute(
+                        update(IdSequence)
+                        .where(IdSequence.name == name)
+                        .values(next_value=IdSequence.next_value + size)
+                    )
+                    if updated.rowcount:
+                        end = conn.execute(select(IdSequence.next_value).where(IdSequence.name == name)).scalar_one()
+                    else:
+                        # Первая выдача для таблицы: продолжаем после уже существующих ID
+                        current_max = conn.execute(select(func.max(table.c.id))).scalar() if table is not None else None
+                        end = max((current_max or 0) + 1, ID_START) + size
+                        conn.execute(insert(IdSequence).values(name=name, next_value=end))
+                with self._count_lock:
+                    self.reservations += 1
+                return end - size
+            except IntegrityError:
+                # Строку счетчика одновременно создал другой процесс - повторяем через UPDATE
+                continue
+        raise ValueError("Не удалось зарезервировать блок ID")
+
+
+id_allocator = BlockIdAllocator()
+
+
+def generate_unique_id(session: Session, model: Type[Any]) -> int:
+    """
+    Уникальный ID из зарезервированного блока (без запросов к БД, кроме редкого резервирования блока)
+    """
+    return generate_unique_ids(session, model, 1)[0]
 
 
 def create_with_unique_id(session: Session, model: Type[Any], **kwargs) -> Any:
@@ -34,4 +158,70 @@ def create_with_unique_id(session: Session, model: Type[Any], **kwargs) -> Any:
     obj = model(id=unique_id, **kwargs)
     session.add(obj)
     session.flush()
-    return obj
\ No newline at end of file
+    return obj
+
+
+def generate_unique_ids(session: Session, model: Type[Any], count: int) -> list[int]:
+    """
+    Генерация count уникальных ID для пакетной вставки
+    """
+    table = model.__table__
+    return id_allocator.allocate(session.get_bind(), table, table.name, count)
+
+
+def _benchmark_worker(database_url: str, table_name: str, worker: int, rows: int, batch: int):
+    """Один процесс бенчмарка: выдает ID и вставляет их пачками (PRIMARY KEY ловит любой дубликат)"""
+    from sqlalchemy import BigInteger, Column, Integer, MetaData, create_engine
+
+    engine = create_engine(database_url)
+    table = Table(table_name, MetaData(), Column("id", BigInteger, primary_key=True), Column("worker", Integer))
+    done = 0
+    while done < rows:
+        size = min(batch, rows - done)
+        ids = id_allocator.allocate(engine, table, table_name, size)
+        with engine.begin() as conn:
+            conn.execute(insert(table), [{"id": i, "worker": worker} for i in ids])
+        done += size
+    engine.dispose()
+    return id_allocator.reservations
+
+
+if __name__ == "__main__":
+    # Бенчмарк: python -m id_generator --workers 8 --rows 100000 [--database-url mysql+mysqlconnector://...]
+    # Создает временную таблицу, несколько процессов параллельно вставляют строки с выданными ID
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+    from sqlalchemy import BigInteger, Column, Integer, MetaData, create_engine, delete
+
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка выдачи ID блоками")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=100_000, help="Всего строк")
+    parser.add_argument("--batch", type=int, default=100, help="Строк в одной транзакции")
+    args = parser.parse_args()
+
+    table_name = "id_benchmark"
+    engine = create_engine(args.database_url)
+    metadata = MetaData()
+    bench_table = Table(table_name, metadata, Column("id", BigInteger, primary_key=True), Column("worker", Integer))
+    IdSequence.__table__.create(engine, checkfirst=True)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    try:
+        per_worker = args.rows // args.workers
+        started = time.perf_counter()
+        with ProcessPoolExecutor(args.workers) as pool:
+            reservations = sum(pool.map(
+                _benchmark_worker,
+                *zip(*[(args.database_url, table_name, w, per_worker, args.batch) for w in range(args.workers)])
+            ))
+        elapsed = time.perf_counter() - started
+
+        with engine.connect() as conn:
+            total, distinct = conn.execute(select(func.count(), func.count(bench_table.c.id.distinct()))).one()
+        print(f"Строк: {total}, уникальных ID: {distinct}, дубликатов: {total - distinct}")
+        print(f"Время: {elapsed:.2f} с, {total / elapsed:,.0f} вставок/с, резервирований блоков: {reservations}")
+    finally:
+        metadata.drop_all(engine)
+        with engine.begin() as conn:
+            conn.execute(delete(IdSequence).where(IdSequence.name == table_name))
@@ -1,27 +1,59 @@
 import os
+import shutil
+import tempfile
 from pathlib import Path
 from fastapi import HTTPException, UploadFile
+from fastapi.staticfiles import StaticFiles
 
 # Папка для хранения изображений
 UPLOAD_DIR = Path("static/img/")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Недописанные загрузки: рядом с UPLOAD_DIR (та же файловая система - os.replace атомарен),
+# но вне раздаваемой папки, чтобы их нельзя было скачать
+UPLOAD_TMP_DIR = Path("static/.img-tmp/")
+UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+
+# Размер куска при записи: в памяти никогда не держится больше одного куска файла
+CHUNK_SIZE = 1024 * 1024
+
 
 def save_image(file: UploadFile, filename: str) -> str:
-    # Удаляем старый файл, если он существует
+    # Имя файла не должно выводить за пределы папки
+    if Path(filename).name != filename or filename.startswith("."):
+        raise HTTPException(status_code=400, detail="Некорректное имя файла")
     file_location = UPLOAD_DIR / filename
-    if file_location.exists():
-        os.remove(file_location)
 
-    # Сохраняем новый файл
+    # Пишем кусками во временный файл и атомарно подменяем старый:
+    # читатели видят либо старое изображение, либо новое целиком
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_TMP_DIR, prefix=".upload-")
     try:
-        with open(file_location, "wb") as buffer:
-            buffer.write(file.file.read())
+        with os.fdopen(fd, "wb") as buffer:
+            file.file.seek(0)
+            shutil.copyfileobj(file.file, buffer, CHUNK_SIZE)
+            buffer.flush()
+            os.fsync(buffer.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_location)
         return f"static/img/{filename}"  # Возвращаем путь к файлу
     except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}")
 
 
+class ImageStaticFiles(StaticFiles):
+    """
+    Раздача локальных изображений: Range, ETag и 304 Not Modified дает StaticFiles.
+    Файлы перезаписываются под тем же именем, поэтому браузер перепроверяет их по ETag.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", "public, no-cache")
+        return response
+
+
 # Функция для удаления изображения
 def delete_image(filename: str):
     try:
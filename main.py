@@ -1,4 +1,7 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 
 from api.admin import setup_admin_endpoints
 from api.catalog import setup_catalog_endpoints
@@ -7,15 +10,62 @@ from api.address import setup_address_endpoints
 from api.auth import setup_auth_endpoints
 from api.order import setup_order_endpoints
 from api.password import setup_password_endpoints
+from api.uploads import setup_upload_endpoints
 from api.verification import setup_verification_endpoints
-from core.database import create_tables
+from core.database import create_tables, engine, async_engine, pool_status
+from core.replicas import replica_router, ReplicaStickinessMiddleware
+from core.query_stats import QueryStatsMiddleware, query_metrics
+from core.s3 import s3_service
+from core.s3_outbox import s3_deletion_worker
+from core.translate import translator
+from id_generator import id_allocator
+from images import UPLOAD_DIR, ImageStaticFiles
+from models.id_mixin import IDMixin
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Блоки ID для всех моделей с IDMixin резервируются до первых запросов (см. BlockIdAllocator)
+    await run_in_threadpool(id_allocator.prefill, engine, [model.__table__ for model in IDMixin.__subclasses__()])
+    # Сохраненные переводы названий секций (файл читается в пуле потоков)
+    await translator.cache.load()
+    # Фоновое удаление файлов из очереди S3 (см. core/s3_outbox.py)
+    s3_deletion_worker.start()
+    # Периодическая проверка реплик для чтения (если заданы DATABASE_REPLICA_URLS)
+    replica_router.start()
+    yield
+    await s3_deletion_worker.stop()
+    await replica_router.stop()
+    # Закрываем пул соединений HTTP-клиентов и дожидаемся загрузок в S3
+    await translator.aclose()
+    s3_service.shutdown()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/healthz")
 def health_check():
-    return {"status": "OK"}
+    # Состояние пула соединений: занятые/свободные соединения, ожидание выдачи (мс) и таймауты
+    return {
+        "status": "OK",
+        "db_pool": pool_status(engine.pool),
+        "db_pool_async": pool_status(async_engine.pool),
+        "db_replicas": replica_router.status(),
+    }
+
+@app.get("/metrics/s3")
+def s3_metrics():
+    """Статистика загрузок файлов в хранилище (задержки в мс)"""
+    return s3_service.metrics.snapshot()
+
+@app.get("/metrics/db")
+def db_metrics():
+    """
+    Запросы к БД по эндпоинтам: среднее и максимальное число, время (мс), вероятные N+1.
+    Текст запросов - только при settings.query_stats_statements() (в профиле prod скрыт)
+    """
+    return query_metrics.snapshot()
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,8 +77,19 @@ app.add_middleware(
     allow_credentials=True,  # Разрешить куки и авторизацию
     allow_methods=["*"],  # Разрешить все HTTP-методы (GET, POST, PUT, DELETE и т.д.)
     allow_headers=["*"],  # Разрешить все заголовки
+    # Токен следующей страницы для /drinks/ и статистика SQL-запросов (QueryStatsMiddleware)
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# После записи пользователь какое-то время читает из основной БД, а не из реплик
+app.add_middleware(ReplicaStickinessMiddleware, router=replica_router)
+
+# Число и время SQL-запросов каждого ответа в Server-Timing, сводка в /metrics/db
+app.add_middleware(QueryStatsMiddleware)
+
+# Локальное хранилище изображений (static/img/), без S3
+app.mount("/static/img", ImageStaticFiles(directory=UPLOAD_DIR), name="images")
+
 # Инициализация БД
 create_tables()
 
@@ -41,3 +102,4 @@ setup_admin_endpoints(app)
 setup_address_endpoints(app)
 setup_password_endpoints(app)
 setup_verification_endpoints(app)
+setup_upload_endpoints(app)
@@ -0,0 +1,52 @@
+"""Add effective_sale and price_final to drinkvolumeprice
+
+Revision ID: 58c403e5a934
+Revises: 5faaedc065c2
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '58c403e5a934'
+down_revision: Union[str, None] = '5faaedc065c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # 1. Добавляем колонки
+    op.add_column('drinkvolumeprice', sa.Column('effective_sale', sa.Integer(), nullable=False, server_default="0"))
+    op.add_column('drinkvolumeprice', sa.Column('price_final', sa.Integer(), nullable=False, server_default="0"))
+
+    # 2. Заполняем значения. Считаем в Python, чтобы округление совпадало с приложением
+    # (round() округляет к четному, ROUND() в MySQL - от нуля)
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT v.id, v.price, v.sale, d.global_sale "
+        "FROM drinkvolumeprice v JOIN drink d ON d.id = v.drink_id"
+    )).all()
+
+    updates = []
+    for volume_id, price, sale, global_sale in rows:
+        sale_percent = sale or global_sale or 0
+        updates.append({
+            "id": volume_id,
+            "effective_sale": sale_percent,
+            "price_final": round(price * (100 - sale_percent) / 100),
+        })
+
+    if updates:
+        connection.execute(
+            sa.text("UPDATE drinkvolumeprice SET effective_sale = :effective_sale, price_final = :price_final WHERE id = :id"),
+            updates
+        )
+
+
+def downgrade():
+    op.drop_column('drinkvolumeprice', 'price_final')
+    op.drop_column('drinkvolumeprice', 'effective_sale')
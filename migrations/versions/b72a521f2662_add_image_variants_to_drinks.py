@@ -0,0 +1,30 @@
+"""Add WebP image variants to drink and drinkvolumeprice
+
+Revision ID: b72a521f2662
+Revises: 58c403e5a934
+Create Date: 2026-10-17 13:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b72a521f2662'
+down_revision: Union[str, None] = '58c403e5a934'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    for table in ('drink', 'drinkvolumeprice'):
+        op.add_column(table, sa.Column('img_thumb_src', sa.String(255), nullable=True))
+        op.add_column(table, sa.Column('img_card_src', sa.String(255), nullable=True))
+
+
+def downgrade():
+    for table in ('drink', 'drinkvolumeprice'):
+        op.drop_column(table, 'img_card_src')
+        op.drop_column(table, 'img_thumb_src')
@@ -0,0 +1,37 @@
+"""Add s3deletion outbox table
+
+Revision ID: c3f1d8a94e27
+Revises: b72a521f2662
+Create Date: 2026-10-17 15:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1d8a94e27'
+down_revision: Union[str, None] = 'b72a521f2662'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table('s3deletion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=512), nullable=False),
+        sa.Column('check_references', sa.Boolean(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(length=512), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_s3deletion_next_attempt_at'), 's3deletion', ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_s3deletion_next_attempt_at'), table_name='s3deletion')
+    op.drop_table('s3deletion')
@@ -0,0 +1,31 @@
+"""Add idsequence table for block ID allocation
+
+Revision ID: d41e7c2b9f08
+Revises: c3f1d8a94e27
+Create Date: 2026-10-17 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41e7c2b9f08'
+down_revision: Union[str, None] = 'c3f1d8a94e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Строки создаются при первой выдаче ID для таблицы (от MAX(id) + 1)
+    op.create_table('idsequence',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('idsequence')
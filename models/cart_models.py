@@ -85,13 +85,12 @@ class CartItem(SQLModel, IDMixin, table=True):
     @property
     def sale(self) -> Optional[int]:
         """Процент скидки (из объема или глобальный)"""
-        return self.drink_volume_price.sale or self.drink_volume_price.drink.global_sale
+        return self.drink_volume_price.effective_sale or None
 
     @property
     def price_final(self) -> int:
         """Цена со скидкой за 1 единицу"""
-        discount = self.sale or 0
-        return round(self.price_original * (100 - discount) / 100)
+        return self.drink_volume_price.price_final
 
 
 class DeliveryInfo(SQLModel, IDMixin, table=True):
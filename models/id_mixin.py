@@ -1,6 +1,12 @@
 # models/id_mixin.py
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import Session
-from id_generator import create_with_unique_id
+from sqlmodel.ext.asyncio.session import AsyncSession
+from id_generator import create_with_unique_id, generate_unique_ids
 
 class IDMixin:
     @classmethod
@@ -8,3 +14,53 @@ class IDMixin:
         """Создает объект с автоматически сгенерированным уникальным ID"""
         kwargs.pop('model', None)  # Удаляем лишний параметр, если есть
         return create_with_unique_id(session, cls, **kwargs)
+
+    @classmethod
+    async def create_async(cls, session: AsyncSession, **kwargs):
+        """create для AsyncSession"""
+        kwargs.pop('model', None)
+        return await session.run_sync(create_with_unique_id, cls, **kwargs)
+
+    @classmethod
+    def create_many(cls, session: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Создает несколько строк одним многострочным INSERT (executemany) без flush и SELECT на строку.
+        ID выделяются сразу на все строки. Возвращает ID в порядке rows.
+        Объекты в сессию не добавляются - при необходимости их нужно загрузить отдельно.
+        """
+        if not rows:
+            return []
+
+        # Значения по умолчанию из модели (включая default_factory), как при создании объекта
+        columns = set(cls.__table__.columns.keys())
+        optional = [
+            (name, field) for name, field in cls.model_fields.items()
+            if name in columns and not field.is_required()
+        ]
+
+        ids = generate_unique_ids(session, cls, len(rows))
+        session.execute(insert(cls), [
+            {**{name: field.get_default(call_default_factory=True) for name, field in optional}, **row, "id": new_id}
+            for row, new_id in zip(rows, ids)
+        ])
+        return ids
+
+    @classmethod
+    async def create_many_async(cls, session: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+        """create_many для AsyncSession"""
+        return await session.run_sync(cls.create_many, rows)
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _assign_block_ids(session, flush_context, instances):
+    """
+    Новым объектам с IDMixin без ID выдаем ID из блока: без этого сработал бы AUTO_INCREMENT
+    (max(id) + 1), который попадает в диапазон, уже зарезервированный процессом
+    """
+    pending = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, IDMixin) and obj.id is None:
+            pending[type(obj)].append(obj)
+    for model, objects in pending.items():
+        for obj, new_id in zip(objects, generate_unique_ids(session, model, len(objects))):
+            obj.id = new_id
@@ -0,0 +1,8 @@
+from sqlalchemy import BigInteger, Column
+from sqlmodel import SQLModel, Field
+
+
+# Счетчики для выдачи ID блоками (hi/lo), одна строка на таблицу - см. id_generator.py
+class IdSequence(SQLModel, table=True):
+    name: str = Field(primary_key=True, max_length=64)  # Имя таблицы
+    next_value: int = Field(sa_column=Column(BigInteger, nullable=False))  # Первый еще не выданный ID
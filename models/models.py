@@ -1,3 +1,5 @@
+from datetime import datetime, UTC
+
 from sqlmodel import SQLModel, Field, Relationship
 from typing import List, Optional
 from models.id_mixin import IDMixin
@@ -7,6 +9,8 @@ from models.id_mixin import IDMixin
 class DrinkBase(SQLModel):
     name: str
     img_src: Optional[str] = None
+    img_thumb_src: Optional[str] = None  # WebP-миниатюра
+    img_card_src: Optional[str] = None  # WebP для карточки каталога
     ingredients: str
     product_description: str
     global_sale: Optional[int] = None
@@ -18,7 +22,12 @@ class DrinkVolumePrice(SQLModel, IDMixin, table=True):
     price: int
     quantity: int
     sale: Optional[int] = None
+    # Материализованные значения (см. core/pricing.py), пересчитываются при изменении price, sale или global_sale
+    effective_sale: int = Field(default=0)  # Действующий процент скидки
+    price_final: int = Field(default=0)  # Цена со скидкой за 1 единицу
     img_src: Optional[str] = None
+    img_thumb_src: Optional[str] = None  # WebP-миниатюра
+    img_card_src: Optional[str] = None  # WebP для карточки каталога
     drink_id: int = Field(foreign_key="drink.id")  # Ссылка на напиток
     drink: "Drink" = Relationship(back_populates="volume_prices")
     order_items: List["OrderItem"] = Relationship(back_populates="drink_volume_price",
@@ -45,3 +54,15 @@ class Section(SectionBase, table=True):
     drinks: List[Drink] = Relationship(back_populates="section",
                                        sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
+
+
+# Очередь удаления объектов из S3 (outbox): строки добавляются в той же транзакции,
+# что и изменение в БД, и разбираются фоновым воркером (см. core/s3_outbox.py)
+class S3Deletion(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    key: str = Field(max_length=512)  # Ключ объекта в бакете
+    check_references: bool = Field(default=False)  # Удалять, только если на файл не ссылается ни один товар
+    attempts: int = Field(default=0)  # Количество неудачных попыток
+    next_attempt_at: datetime = Field(index=True)  # Не раньше этого времени (UTC)
+    last_error: Optional[str] = Field(default=None, max_length=512)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
@@ -1,5 +1,9 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from enum import Enum
+
+from pydantic import BaseModel, Field, computed_field
+from typing import Dict, List, Optional, Union
+
+from core.images import build_srcset
 
 # Схема для создания объема и цены напитка
 class DrinkVolumePriceCreate(BaseModel):
@@ -28,6 +32,26 @@ class DrinkVolumePriceUpdate(BaseModel):
     sale: Optional[int] = None
     img_src: Optional[str] = None
 
+# Схемы для пакетного обновления цен и остатков
+class DrinkVolumeBulkItem(BaseModel):
+    volume_id: int
+    price: Optional[int] = None
+    quantity: Optional[int] = None
+    sale: Optional[int] = None
+
+class DrinkVolumeBulkUpdate(BaseModel):
+    items: List[DrinkVolumeBulkItem]
+
+class DrinkVolumeBulkResult(BaseModel):
+    volume_id: int
+    status: str  # updated / not_found / invalid
+    error: Optional[str] = None
+
+class DrinkVolumeBulkReport(BaseModel):
+    updated: int = 0
+    failed: int = 0
+    results: List[DrinkVolumeBulkResult] = []
+
 # Схема для создания напитка
 class DrinkCreate(BaseModel):
     name: str
@@ -37,9 +61,29 @@ class DrinkCreate(BaseModel):
     section_id: str
     volume_prices: List[DrinkVolumePriceCreate]
 
+# Объем в ответах каталога (с WebP-вариантами изображения)
+class DrinkVolumePriceOut(DrinkVolumePriceCreate):
+    img_thumb_src: Optional[str] = None
+    img_card_src: Optional[str] = None
+
+    @computed_field
+    @property
+    def img_srcset(self) -> Optional[str]:
+        return build_srcset(self.img_thumb_src, self.img_card_src)
+
 # Схема для чтения напитка
 class DrinkRead(DrinkCreate):
     id: int
+    volume_prices: List[DrinkVolumePriceOut]
+    img_src: Optional[str] = None
+    img_thumb_src: Optional[str] = None
+    img_card_src: Optional[str] = None
+
+    @computed_field
+    @property
+    def img_srcset(self) -> Optional[str]:
+        return build_srcset(self.img_thumb_src, self.img_card_src)
+
     class Config:
         from_attributes = True  # Для работы с объектами SQLAlchemy/SQLModel
 
@@ -53,12 +97,20 @@ class SectionCreate(BaseModel):
 class SectionRead(SectionCreate):
     pass
 
+# Секция со сводкой для витрины ("от X ₽", количество напитков)
+class SectionSummary(SectionRead):
+    drink_count: int = 0
+    in_stock_count: int = 0  # Напитков, у которых хотя бы один объем в наличии
+    price_min: Optional[int] = None  # Минимальная итоговая цена (со скидкой)
+    price_max: Optional[int] = None
+
 
 class SectionWithDrinks(SectionCreate):
     drinks: List[DrinkRead]
-    total_drinks: int
-    total_pages: int
-    current_page: int
+    total_drinks: Optional[int] = None  # Не считается в режиме курсора без with_total
+    total_pages: Optional[int] = None
+    current_page: Optional[int] = None  # None в режиме курсора
+    next_cursor: Optional[str] = None  # Токен следующей страницы (None - страниц больше нет)
 
 class SectionDrinksResponse(BaseModel):
     id: str
@@ -66,4 +118,64 @@ class SectionDrinksResponse(BaseModel):
     drinks: List[DrinkRead]
 
 
+class FacetValueCount(BaseModel):
+    value: int
+    count: int  # Количество напитков с этим значением при остальных выбранных фильтрах
+
+class SectionFacets(BaseModel):
+    volumes: List[FacetValueCount]
+    on_sale: int  # Сколько напитков со скидкой
+    in_stock: int  # Сколько напитков в наличии
+    price_min: Optional[int] = None  # Диапазон итоговой цены (со скидкой)
+    price_max: Optional[int] = None
+
+class SectionFilterResponse(SectionWithDrinks):
+    facets: SectionFacets
+
+
+class ImportRowError(BaseModel):
+    line: int  # Номер строки в файле
+    error: str
+
+class CatalogImportReport(BaseModel):
+    """Отчет о пакетном импорте каталога"""
+    total_rows: int = 0
+    created_drinks: int = 0
+    updated_drinks: int = 0
+    created_volumes: int = 0
+    updated_volumes: int = 0
+    failed_rows: int = 0
+    errors: List[ImportRowError] = []
+    elapsed_seconds: float = 0
+    rows_per_second: float = 0
+
+
+# Куда прикрепляется изображение, загруженное напрямую в хранилище
+class ImageTarget(str, Enum):
+    DRINK = "drink"
+    VOLUME = "volume"
+    SECTION = "section"
+
+class ImageUploadRequest(BaseModel):
+    target: ImageTarget
+    filename: str  # Исходное имя файла (берется только расширение)
+    content_type: str
+    size: int = Field(gt=0)  # Размер файла в байтах
+
+class PresignedUpload(BaseModel):
+    """Данные для POST-загрузки из браузера: форма с fields + файл в поле file на url"""
+    key: str
+    url: str
+    fields: Dict[str, str]
+    expires_in: int  # Секунд до истечения подписи
+    img_src: str  # Публичный URL файла после загрузки
+
+class ImageUploadFinalize(BaseModel):
+    target: ImageTarget
+    target_id: Union[int, str]  # ID напитка или объема (число) либо секции (строка)
+    key: str  # Ключ из PresignedUpload
 
+class AttachedImage(BaseModel):
+    target: ImageTarget
+    target_id: Union[int, str]
+    img_src: str
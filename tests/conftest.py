@@ -0,0 +1,70 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Настройки задаются до импорта приложения: движки БД и клиенты создаются при импорте модулей
+_db_path = Path(tempfile.mkdtemp()) / "test.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["TRANSLATE_CACHE_PATH"] = str(_db_path.parent / "translate_cache.json")
+for name in ("DB_SSL_CA_PATH", "RENDER_SSL_PATH", "db_host", "db_username", "db_password", "db_database",
+             "SECRET_KEY", "CLIENT_ID", "CLIENT_SECRET", "YC_ACCESS_KEY_ID", "YC_SECRET_ACCESS_KEY",
+             "YC_TRANSLATE_API_KEY", "YC_FOLDER_ID", "YANDEX_APP_PASSWORD"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("db_port", "3306")
+os.environ.setdefault("YC_BUCKET_NAME", "test-bucket")
+os.environ.setdefault("YC_ENDPOINT_URL", "https://storage.yandexcloud.net")
+os.environ.setdefault("YANDEX_EMAIL", "shop@example.com")
+os.environ.setdefault("AWS_DEFAULT_REGION", "ru-central1")
+
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session
+
+from core.catalog_cache import catalog_cache
+from core.database import engine
+from core.pricing import pricing_fields
+from id_generator import id_allocator
+from main import app
+from models.id_mixin import IDMixin
+from models.models import Section, Drink, DrinkVolumePrice
+
+
+@pytest.fixture
+def db():
+    """Пустая БД для каждого теста"""
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    # Счетчики idsequence созданы заново - блоки, выданные процессу раньше, больше не действительны.
+    # Новые блоки резервируются заранее, как при старте приложения
+    id_allocator._blocks.clear()
+    id_allocator.prefill(engine, [model.__table__ for model in IDMixin.__subclasses__()])
+    catalog_cache.bump()
+    yield engine
+
+
+@pytest.fixture
+def client(db):
+    # База URL совпадает с доменом кук приложения, иначе TestClient их не сохранит
+    with TestClient(app, base_url="https://graduate-work-backend.onrender.com") as test_client:
+        yield test_client
+
+
+def seed_catalog(drinks_per_section: int = 50, sections: int = 1):
+    """Секции с напитками по два объема"""
+    with Session(engine) as session:
+        for section_index in range(sections):
+            section = Section(id=f"section-{section_index}", title=f"Секция {section_index}", img_src="x")
+            session.add(section)
+            for index in range(drinks_per_section):
+                drink = Drink.create(
+                    session, name=f"Лимонад {section_index}-{index}", ingredients="вода, сахар",
+                    product_description="Напиток", section_id=section.id, global_sale=10 if index % 3 == 0 else None
+                )
+                for volume, price in ((330, 100 + index), (500, 150 + index)):
+                    DrinkVolumePrice.create(
+                        session, drink_id=drink.id, volume=volume, price=price, quantity=5, sale=None,
+                        **pricing_fields(price, None, drink.global_sale)
+                    )
+        session.commit()
@@ -0,0 +1,20 @@
+import json
+
+from core.catalog_export import iter_catalog_ndjson
+from core.query_stats import assert_query_budget
+from tests.conftest import seed_catalog
+
+
+def test_ndjson_export_matches_listing(client):
+    seed_catalog(drinks_per_section=5, sections=2)
+    expected = sorted(client.get("/drinks/").json(), key=lambda drink: (drink["section_id"], drink["id"]))
+
+    # 10 напитков пакетами по 3: четыре пакета, в каждом запрос напитков и запрос объемов
+    with assert_query_budget(8, max_repeats=4):
+        chunks = list(iter_catalog_ndjson(batch_size=3))
+    assert len(chunks) == 4
+    assert [json.loads(line) for chunk in chunks for line in chunk.splitlines()] == expected
+
+
+def test_ndjson_export_empty_catalog(db):
+    assert list(iter_catalog_ndjson(batch_size=3)) == []
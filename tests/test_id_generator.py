@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import date
+
+from sqlmodel import Session, select
+
+from core.database import engine
+from core.tokens import create_tokens
+from id_generator import id_allocator
+from main import app
+from models.auth_models import User, UserSession, StoreAddress
+from models.models import Drink, DrinkVolumePrice, Section
+from schemas.schemas import DrinkVolumePriceCreate
+from tests.conftest import seed_catalog
+
+
+def _create_drink(client, name):
+    response = client.post("/drinks/", data={
+        "name": name, "ingredients": "вода", "product_description": "Напиток", "section_id": "section-0",
+        "volume_prices": json.dumps([{"volume": 330, "price": 100, "quantity": 5}]),
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_volume_endpoint_and_drink_creation_do_not_collide(client):
+    with Session(engine) as session:
+        session.add(Section(id="section-0", title="Секция", img_src="x"))
+        session.commit()
+
+    first = _create_drink(client, "Первый")
+    # Обработчик вызывается напрямую: multipart-форма с файлом не передает volume_data по HTTP
+    add_drink_volume = next(route.endpoint for route in app.routes if getattr(route, "name", None) == "add_drink_volume")
+    with Session(engine) as session:
+        volume = asyncio.run(add_drink_volume(
+            drink_id=first["id"], volume_data=DrinkVolumePriceCreate(volume=500, price=150, quantity=3, sale=10),
+            image=None, session=session
+        ))
+        assert volume.price_final == 135
+    second = _create_drink(client, "Второй")
+
+    with Session(engine) as session:
+        ids = session.exec(select(DrinkVolumePrice.id)).all()
+    assert len(ids) == len(set(ids)) == 3
+    assert second["id"] != first["id"]
+
+
+def test_plain_insert_gets_block_id(db):
+    """Объект с IDMixin, созданный без .create(), все равно получает ID из блока, а не AUTO_INCREMENT"""
+    seed_catalog(drinks_per_section=1)
+    with Session(engine) as session:
+        drink = session.exec(select(Drink)).first()
+        taken = DrinkVolumePrice.create_many(session, [dict(drink_id=drink.id, volume=1000, price=1, quantity=1)])
+        volume = DrinkVolumePrice(drink_id=drink.id, volume=750, price=1, quantity=1)
+        session.add(volume)
+        session.flush()
+        next_ids = DrinkVolumePrice.create_many(session, [dict(drink_id=drink.id, volume=250, price=1, quantity=1)])
+        assert taken[0] < volume.id < next_ids[0]
+        session.commit()
+
+
+def test_order_does_not_reserve_inside_request_transaction(client, monkeypatch):
+    """После старта блоки уже зарезервированы: оформление заказа не открывает вторую транзакцию к idsequence"""
+    seed_catalog(drinks_per_section=2)
+    with Session(engine) as session:
+        user = User.create(session, email="u@example.com", hashed_password="x", first_name="А", last_name="Б",
+                           birth_date=date(2000, 1, 1), phone="1")
+        StoreAddress.create(session, full_address="ул. Ленина, 1", street="Ленина", house="1")
+        access_token, refresh_token, _ = create_tokens(user)
+        UserSession.create(session, user_id=user.id, refresh_token=refresh_token)
+        session.commit()
+        store_id = session.exec(select(StoreAddress.id)).one()
+        volume_id = session.exec(select(DrinkVolumePrice.id)).first()
+    client.cookies.set("access_token", access_token)
+    client.cookies.set("refresh_token", refresh_token)
+
+    reserve = id_allocator._reserve
+    calls = []
+    monkeypatch.setattr(id_allocator, "_reserve", lambda *args: calls.append(args[2]) or reserve(*args))
+
+    assert client.post("/cart/items/", json={"drink_volume_price_id": volume_id, "quantity": 1}).status_code == 200
+    response = client.post("/orders/", json={"delivery_type": "pickup", "delivery_price": 0, "store_address_id": store_id})
+    assert response.status_code == 200, response.text
+    assert calls == []
@@ -0,0 +1,28 @@
+import io
+import os
+
+from fastapi import UploadFile
+
+import images
+
+
+class _CheckingFile(io.BytesIO):
+    """Проверяет, где лежит недописанный файл, пока save_image читает загрузку"""
+
+    def read(self, *args):
+        assert [name for name in os.listdir(images.UPLOAD_DIR) if name.startswith(".")] == []
+        assert os.listdir(images.UPLOAD_TMP_DIR)
+        return super().read(*args)
+
+
+def test_partial_upload_is_not_in_served_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "UPLOAD_DIR", tmp_path / "img")
+    monkeypatch.setattr(images, "UPLOAD_TMP_DIR", tmp_path / ".img-tmp")
+    images.UPLOAD_DIR.mkdir()
+    images.UPLOAD_TMP_DIR.mkdir()
+    data = os.urandom(3 * images.CHUNK_SIZE)
+
+    assert images.save_image(UploadFile(_CheckingFile(data), filename="a.png"), "a.png") == "static/img/a.png"
+
+    assert (images.UPLOAD_DIR / "a.png").read_bytes() == data
+    assert os.listdir(images.UPLOAD_TMP_DIR) == []
@@ -0,0 +1,40 @@
+import pytest
+
+from core.config import settings
+from core.query_stats import EndpointQueryMetrics, QueryStats, _server_timing, assert_query_budget
+from tests.conftest import seed_catalog
+
+
+@pytest.mark.parametrize("per_page", [5, 40])
+def test_section_page_query_count_does_not_grow_with_page_size(client, per_page):
+    """Секция, страница напитков, их объемы и общее количество - без запроса на каждый напиток"""
+    seed_catalog(drinks_per_section=50)
+    with assert_query_budget(4, max_repeats=1) as stats:
+        response = client.get("/sections/section-0", params={"per_page": per_page})
+    assert response.status_code == 200
+    assert len(response.json()["drinks"]) == per_page
+    assert stats.count == 4
+
+
+def test_server_timing_is_readable_from_frontend(client):
+    seed_catalog(drinks_per_section=1)
+    response = client.get("/sections/section-0", headers={"Origin": "https://zero-percent.vercel.app"})
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert "Server-Timing" in response.headers["access-control-expose-headers"]
+
+
+def test_statement_text_is_hidden_in_prod(monkeypatch):
+    stats = QueryStats()
+    for _ in range(6):
+        stats.record("SELECT secret FROM drink WHERE id = ?", 0.001)
+    repeated = stats.repeated(5)
+    metrics = EndpointQueryMetrics()
+    metrics.record("GET /x", stats, repeated)
+
+    monkeypatch.setattr(settings, "DB_PROFILE", "prod")
+    assert _server_timing(stats, repeated) == 'db;dur=6.00;desc="6 SQL"'
+    assert metrics.snapshot()["GET /x"]["n_plus_one"] == [{"max_repeats": 6}]
+
+    monkeypatch.setattr(settings, "QUERY_STATS_STATEMENTS", True)
+    assert 'n-plus-one-0;desc="x6 SELECT secret' in _server_timing(stats, repeated)
+    assert metrics.snapshot()["GET /x"]["n_plus_one"][0]["statement"].startswith("SELECT secret")
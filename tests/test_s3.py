@@ -0,0 +1,145 @@
+import asyncio
+import io
+import os
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from boto3.s3.transfer import TransferConfig
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+# moto перехватывает запросы только к известным ему адресам - добавляем адрес Yandex Object Storage
+os.environ.setdefault("MOTO_S3_CUSTOM_ENDPOINTS", "https://storage.yandexcloud.net")
+from moto import mock_aws
+
+from sqlmodel import Session, select
+
+import core.images as images
+import core.s3 as s3
+import core.s3_outbox as s3_outbox
+from core.database import engine
+from models.models import Drink, S3Deletion
+from tests.conftest import seed_catalog
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """S3Service на moto с пустым бакетом; подменяет s3_service и в модуле изображений"""
+    with mock_aws():
+        service = s3.S3Service()
+        service.s3.create_bucket(
+            Bucket=service.bucket, CreateBucketConfiguration={"LocationConstraint": "ru-central1"}
+        )
+        monkeypatch.setattr(s3, "s3_service", service)
+        monkeypatch.setattr(images, "s3_service", service)
+        yield service
+        service.shutdown()
+
+
+def _upload(data: bytes, filename: str, content_type: str) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data), filename=filename,
+                      headers={"content-type": content_type})
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_multipart_upload_in_pool(service):
+    """Файл больше порога загружается по частям из пула потоков, с заголовками и статистикой"""
+    # Минимальная часть multipart в S3 - 5 МБ
+    service.transfer_config = TransferConfig(multipart_threshold=5 * MB, multipart_chunksize=5 * MB, max_concurrency=2)
+    data = os.urandom(11 * MB)
+
+    url = asyncio.run(service.upload_file_async(_upload(data, "big.bin", "application/octet-stream"), "files"))
+
+    key = service.key_from_url(url)
+    assert key.startswith("files/") and key.endswith(".bin")
+    stored = service.s3.get_object(Bucket=service.bucket, Key=key)
+    assert stored["Body"].read() == data
+    assert stored["ContentType"] == "application/octet-stream"
+    assert stored["ETag"].strip('"').endswith("-3")  # Три части
+    assert service.metrics.snapshot()["uploads"] == 1
+    assert service.metrics.snapshot()["bytes"] == len(data)
+
+
+def test_upload_image_with_variants_and_reuse(service):
+    data = _png()
+
+    first = asyncio.run(images.upload_image_async(_upload(data, "photo.PNG", "image/png"), "products"))
+
+    assert first["img_src"].endswith(".png")
+    for name, size in images.IMAGE_VARIANTS.items():
+        key = service.key_from_url(first[f"img_{name}_src"])
+        assert key.endswith(f"_{size}.webp")
+        stored = service.s3.get_object(Bucket=service.bucket, Key=key)
+        assert stored["ContentType"] == "image/webp"
+        assert stored["CacheControl"] == images.IMMUTABLE_CACHE_CONTROL
+        with Image.open(stored["Body"]) as variant:
+            assert variant.size == (size, size)
+    assert service.s3.head_object(Bucket=service.bucket, Key=service.key_from_url(first["img_src"]))[
+        "CacheControl"] == images.IMMUTABLE_CACHE_CONTROL
+    assert service.metrics.snapshot()["uploads"] == 1 + len(images.IMAGE_VARIANTS)
+
+    # Тот же файл повторно не загружается - переиспользуются оригинал и варианты
+    second = images.upload_image(_upload(data, "copy.png", "image/png"), "products")
+    assert second == first
+    assert service.metrics.snapshot()["uploads"] == 1 + len(images.IMAGE_VARIANTS)
+
+
+def test_upload_errors_are_counted(service):
+    service.bucket = "missing-bucket"
+
+    with pytest.raises(HTTPException) as error:
+        service.upload_bytes(b"data", "products", "x.webp", "image/webp")
+    assert error.value.status_code == 500
+    with pytest.raises(HTTPException):
+        service.upload_file(_upload(b"data", "x.txt", "text/plain"), "files")
+
+    snapshot = service.metrics.snapshot()
+    assert snapshot["errors"] == 2
+    assert snapshot["uploads"] == 0 and snapshot["avg_ms"] is None
+
+
+def test_deletion_queue_calls_storage_outside_transaction(db, service, monkeypatch):
+    monkeypatch.setattr(s3_outbox, "s3_service", service)
+    for key in ("products/free.webp", "products/used.webp", "products/broken.webp"):
+        service.upload_bytes(b"data", *key.split("/"), "image/webp")
+    seed_catalog(drinks_per_section=1)
+    past = datetime.now(UTC) - timedelta(seconds=1)
+    with Session(engine) as session:
+        drink = session.exec(select(Drink)).one()
+        drink.img_src = service.public_url("products/used.webp")
+        session.add_all([
+            S3Deletion(key="products/free.webp", check_references=False, next_attempt_at=past),
+            S3Deletion(key="products/used.webp", check_references=True, next_attempt_at=past),
+            S3Deletion(key="products/missing.webp", check_references=True, next_attempt_at=past),
+            S3Deletion(key="products/broken.webp", check_references=False, next_attempt_at=past),
+        ])
+        session.commit()
+
+    # HEAD и DeleteObjects идут без открытой транзакции и без соединения из пула
+    def outside_transaction(method):
+        def wrapper(*args):
+            assert engine.pool.checkedout() == 0
+            return method(*args)
+        return wrapper
+
+    delete_keys = service.delete_keys
+    monkeypatch.setattr(service, "last_modified", outside_transaction(service.last_modified))
+    monkeypatch.setattr(service, "delete_keys", outside_transaction(
+        lambda keys: {**delete_keys([key for key in keys if "broken" not in key]), "products/broken.webp": "AccessDenied"}
+    ))
+
+    assert s3_outbox.drain() == 4
+
+    assert service.head("products/free.webp") is None
+    assert service.head("products/used.webp") is not None
+    with Session(engine) as session:
+        [left] = session.exec(select(S3Deletion)).all()
+    assert left.key == "products/broken.webp" and left.attempts == 1 and left.last_error == "AccessDenied"
+    assert left.next_attempt_at.replace(tzinfo=UTC) > datetime.now(UTC)
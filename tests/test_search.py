@@ -0,0 +1,43 @@
+from sqlalchemy import update
+from sqlmodel import Session
+
+from core.config import settings
+from core.database import engine
+from core.search import search_index
+from models.models import Drink
+from tests.conftest import seed_catalog
+
+
+def _search(query, limit=20):
+    with Session(engine) as session:
+        return search_index.search(session, query, limit)
+
+
+def test_changes_from_other_workers_are_picked_up_on_refresh(db):
+    seed_catalog(drinks_per_section=5)
+    found = [drink_id for drink_id, _ in _search("лимонад")]
+    assert len(found) == 5
+
+    # Другой воркер переименовал напиток: catalog_cache.bump() этого процесса не вызывался
+    with Session(engine) as session:
+        session.exec(update(Drink).where(Drink.id == found[0]).values(name="Квас хлебный"))
+        session.commit()
+    assert [drink_id for drink_id, _ in _search("квас")] == []
+
+    # Прошел CATALOG_CACHE_TTL_SECONDS: поиск запускает фоновое обновление и пока отвечает по старому индексу
+    search_index._refresh_at = 0
+    assert len(_search("лимонад")) == 5
+    search_index._background.join()
+
+    assert [drink_id for drink_id, _ in _search("квас")] == [found[0]]
+    assert found[0] not in [drink_id for drink_id, _ in _search("лимонад")]
+
+
+def test_scoring_budget_keeps_best_results(db, monkeypatch):
+    """Оценка ограничена SEARCH_MAX_SCORED_DOCS, но документы с наибольшим вкладом оцениваются первыми"""
+    seed_catalog(drinks_per_section=50)
+    query = "лимонад вода сахар напиток"
+    monkeypatch.setattr(settings, "SEARCH_MAX_SCORED_DOCS", 0)
+    exact = [round(score, 6) for _, score in _search(query, limit=5)]
+    monkeypatch.setattr(settings, "SEARCH_MAX_SCORED_DOCS", 20)
+    assert [round(score, 6) for _, score in _search(query, limit=5)] == exact
@@ -0,0 +1,39 @@
+import asyncio
+import json
+import threading
+
+from core.translate import TranslationCache, YandexTranslator
+
+
+def test_cache_file_is_written_and_read_off_the_event_loop(tmp_path, monkeypatch):
+    path = tmp_path / "translate_cache.json"
+    translator = YandexTranslator(TranslationCache(str(path)))
+    requests = []
+
+    async def fake_request(texts, target_lang):
+        requests.append(texts)
+        return [f"{text}-en" for text in texts]
+
+    monkeypatch.setattr(translator, "_request", fake_request)
+    io_threads = []
+    for name in ("_read", "_write"):
+        original = getattr(TranslationCache, name)
+
+        def recorded(self, original=original):
+            io_threads.append(threading.current_thread())
+            return original(self)
+
+        monkeypatch.setattr(TranslationCache, name, recorded)
+
+    async def scenario():
+        assert await translator.translate_many(["Соки", "Воды", "Соки"]) == ["Соки-en", "Воды-en", "Соки-en"]
+        # Новый процесс: переводы загружаются из файла, повторного запроса к API нет
+        restarted = YandexTranslator(TranslationCache(str(path)))
+        await restarted.cache.load()
+        monkeypatch.setattr(restarted, "_request", fake_request)
+        return await restarted.translate("Воды")
+
+    assert asyncio.run(scenario()) == "Воды-en"
+    assert requests == [["Соки", "Воды"]]
+    assert json.loads(path.read_text(encoding="utf-8")) == {"en:Соки": "Соки-en", "en:Воды": "Воды-en"}
+    assert len(io_threads) == 2 and threading.main_thread() not in io_threads